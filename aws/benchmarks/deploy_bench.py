@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import boto3
+from services.clients import ClientFactory
+from services.instrumentation import Tracer
+from services.s3.operations import S3Operations
+from services.cloudfront.operations import CloudFrontOperations
+from benchmarks.sitegen import generate_site
+from benchmarks.standin import CloudFrontFunctionStandIn, CloudFrontPolicyStandIn, LatencyInjector, S3Throttle
+from services.limits import limiter_metrics
+
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+REGION = 'us-west-2'
+BUCKET_NAME = 'deploy-benchmark-site'
+FUNCTION_NAME = 'backendredirection'
+EC2_ENDPOINT = '127.0.0.1:5000'
+
+
+def run_scenario(session, name, fn, trace_memory=False):
+    tracer = Tracer()
+    clients = ClientFactory(session, tracer=tracer)
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with tracer.stage(name):
+        summary = fn(clients)
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    operations = tracer.summary()['operations']
+    result = {
+        'scenario': name,
+        'seconds': seconds,
+        'api_calls': sum(operation['calls'] for operation in operations.values()),
+        'api_calls_by_operation': {operation: values['calls'] for operation, values in operations.items()},
+        'peak_traced_mb': peak / 1048576 if peak is not None else None,
+        'throttles': sum(operation['throttles'] for operation in operations.values())
+    }
+    if isinstance(summary, dict) and 'bytes' in summary:
+        result['files'] = summary['files']
+        result['files_per_second'] = summary['files'] / seconds if seconds else 0.0
+        result['mb_per_second'] = summary['bytes'] / seconds / 1048576 if seconds else 0.0
+    return result
+
+
+def benchmark(files, site_root, latency, workers, manifest_path, s3_capacity=None, trace_memory=False):
+    session = boto3.Session(aws_access_key_id='benchmark', aws_secret_access_key='benchmark', region_name=REGION)
+    LatencyInjector(latency).register(session)
+    CloudFrontFunctionStandIn(latency).register(session)
+    CloudFrontPolicyStandIn(latency).register(session)
+    if s3_capacity:
+        S3Throttle(s3_capacity).register(session)
+
+    def upload(clients):
+        s3_ops = S3Operations(clients, REGION, max_workers=workers)
+        s3_ops.create_bucket(BUCKET_NAME)
+        return s3_ops.upload_files(BUCKET_NAME, site_root)
+
+    def sync(clients):
+        return S3Operations(clients, REGION, max_workers=workers).sync_files(BUCKET_NAME, site_root, manifest_path=manifest_path)
+
+    def cloudfront(clients):
+        return CloudFrontOperations(clients).setup_cloudfront(BUCKET_NAME, REGION, FUNCTION_NAME, EC2_ENDPOINT)
+
+    results = [
+        run_scenario(session, 'upload', upload, trace_memory),
+        run_scenario(session, 'sync-initial', sync, trace_memory),
+        run_scenario(session, 'sync-unchanged', sync, trace_memory),
+        run_scenario(session, 'cloudfront-create', cloudfront, trace_memory),
+        run_scenario(session, 'cloudfront-converged', cloudfront, trace_memory),
+    ]
+    for result in results:
+        result['site_files'] = files
+    return results
+
+
+def print_results(results, baseline=None):
+    baseline = {(result['site_files'], result['scenario']): result for result in baseline or []}
+    print(f"{'files':>8} {'scenario':<22} {'seconds':>9} {'files/s':>9} {'MB/s':>8} {'API calls':>9} {'throttled':>9} {'peak MB':>8} "
+          f"{'vs baseline':>11}")
+    for result in results:
+        previous = baseline.get((result['site_files'], result['scenario']))
+        change = f"{(result['seconds'] / previous['seconds'] - 1) * 100:+.1f}%" if previous and previous['seconds'] else ''
+        peak = f"{result['peak_traced_mb']:.1f}" if result.get('peak_traced_mb') is not None else '-'
+        print(f"{result['site_files']:>8} {result['scenario']:<22} {result['seconds']:>9.2f} {result.get('files_per_second', 0):>9.1f} "
+              f"{result.get('mb_per_second', 0):>8.2f} {result['api_calls']:>9} {result.get('throttles', 0):>9} "
+              f"{peak:>8} {change:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark deploys against an in-process S3/CloudFront stand-in (moto).')
+    parser.add_argument('--files', type=int, nargs='+', default=[100, 1000, 10000], help='Synthetic site sizes to benchmark.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of latency injected into every API call.')
+    parser.add_argument('--workers', type=int, default=16, help='Upload worker count.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON to this path.')
+    parser.add_argument('--baseline', help='Compare against results previously written with --output.')
+    parser.add_argument('--s3-capacity', type=float, help='Answer S3 requests above this many per second with SlowDown.')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Report peak traced memory per scenario (slows every scenario down; compare timings without it).')
+    parser.add_argument('--keep-sites', help='Generate sites under this directory and keep them between runs.')
+    args = parser.parse_args()
+
+    if mock_aws is None:
+        raise SystemExit('The deploy benchmark needs moto: pip install "moto[s3,cloudfront,sts]"')
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    work_dir = args.keep_sites or tempfile.mkdtemp(prefix='deploy-bench-')
+    results = []
+    try:
+        for files in args.files:
+            site_root = os.path.join(work_dir, f'site-{files}-{args.seed}')
+            if not os.path.exists(site_root):
+                site_bytes = generate_site(site_root, files, args.seed)
+                print(f'Generated {files} files ({site_bytes / 1048576:.1f} MB) in {site_root}')
+            with mock_aws():
+                results.extend(benchmark(files, site_root, args.latency, args.workers, os.path.join(work_dir, f'manifest-{files}.json'),
+                                         args.s3_capacity, args.trace_memory))
+            os.remove(os.path.join(work_dir, f'manifest-{files}.json'))
+    finally:
+        if not args.keep_sites:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    for service_name, metrics in sorted(limiter_metrics().items()):
+        print(f"limiter {service_name}: rate {metrics['rate']:.1f}/s, {metrics['throttles']} throttled, {metrics['decreases']} backoffs, "
+              f"{metrics['waited_seconds']:.2f}s waiting")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import gzip
+import os
+import random
+import time
+import tracemalloc
+from services.cloudfront.logs import DEFAULT_FIELDS, analyze_files
+
+# (path prefix, share of requests, hit ratio, median time-taken in seconds, median bytes)
+PATH_PROFILES = [
+    ('/', 0.10, 0.55, 0.020, 6 * 1024),
+    ('/assets/', 0.55, 0.97, 0.004, 24 * 1024),
+    ('/images/', 0.25, 0.93, 0.006, 60 * 1024),
+    ('/api/', 0.10, 0.00, 0.120, 2 * 1024),
+]
+EDGES = ['IAD89-C1', 'FRA56-P3', 'NRT57-C2', 'SIN2-C1', 'GRU3-C2', 'SFO5-P1']
+
+
+def log_line(rng, timestamp):
+    prefix, _, hit_ratio, median_seconds, median_bytes = rng.choices(PATH_PROFILES, [profile[1] for profile in PATH_PROFILES])[0]
+    result = 'Hit' if rng.random() < hit_ratio else rng.choice(['Miss', 'Miss', 'Miss', 'Error'])
+    seconds = median_seconds * rng.lognormvariate(0, 0.8) * (1 if result == 'Hit' else 6)
+    values = dict.fromkeys(DEFAULT_FIELDS, '-')
+    values.update({
+        'date': time.strftime('%Y-%m-%d', time.gmtime(timestamp)),
+        'time': time.strftime('%H:%M:%S', time.gmtime(timestamp)),
+        'x-edge-location': rng.choice(EDGES),
+        'sc-bytes': str(int(median_bytes * rng.lognormvariate(0, 1.0))),
+        'cs-method': 'GET',
+        'cs-uri-stem': f'{prefix}file{rng.randrange(5000)}.js' if prefix != '/' else '/index.html',
+        'sc-status': '200' if result != 'Error' else '503',
+        'x-edge-result-type': result,
+        'x-edge-response-result-type': result,
+        'time-taken': f'{seconds:.3f}'
+    })
+    return '\t'.join(values[field] for field in DEFAULT_FIELDS)
+
+
+def generate_logs(root, lines, files=4, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    start = 1700000000
+    for index in range(files):
+        path = os.path.join(root, f'E2EXAMPLE.2024-01-01-{index:02d}.{rng.getrandbits(32):08x}.gz')
+        with gzip.open(path, 'wt', encoding='utf-8') as file:
+            file.write('#Version: 1.0\n')
+            file.write(f"#Fields: {' '.join(DEFAULT_FIELDS)}\n")
+            for line in range(lines // files):
+                file.write(log_line(rng, start + line) + '\n')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic CloudFront access logs and time the analyzer on them.')
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true', help='Report peak traced memory (slows the analyzer down several times).')
+    parser.add_argument('--output', default='.deploy/synthetic-logs', help='Directory for the generated .gz log files.')
+    args = parser.parse_args()
+
+    paths = generate_logs(args.output, args.lines, args.files, args.seed)
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    aggregator = analyze_files(paths, chunk_size=args.chunk_size)
+    seconds = time.perf_counter() - start
+    aggregator.print_report()
+    print(f'Analyzed {aggregator.lines} lines in {seconds:.2f}s ({aggregator.lines / seconds:.0f} lines/s)')
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'Peak traced memory {peak / 1048576:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import os
+import random
+
+# (directory, extension, share of files, median size in bytes, sigma of the log-normal size distribution, text content)
+FILE_PROFILES = [
+    ('', '.html', 0.02, 6 * 1024, 0.8, True),
+    ('assets', '.js', 0.30, 24 * 1024, 1.4, True),
+    ('assets', '.css', 0.08, 8 * 1024, 1.0, True),
+    ('assets', '.map', 0.10, 64 * 1024, 1.2, True),
+    ('assets', '.json', 0.05, 4 * 1024, 1.2, True),
+    ('images', '.png', 0.20, 40 * 1024, 1.3, False),
+    ('images', '.jpg', 0.15, 90 * 1024, 1.2, False),
+    ('images', '.svg', 0.05, 3 * 1024, 0.9, True),
+    ('fonts', '.woff2', 0.05, 30 * 1024, 0.5, False),
+]
+MAX_FILE_SIZE = 8 * 1024 * 1024
+FILES_PER_DIRECTORY = 500
+WORDS = b'const let function return import export default async await class extends if else for while new this null true false '
+
+
+def text_bytes(size, rng):
+    offset = rng.randrange(len(WORDS))
+    repeated = WORDS[offset:] + WORDS * (size // len(WORDS) + 2)
+    return repeated[:size]
+
+
+def generate_site(root, files, seed=0):
+    rng = random.Random(seed)
+    weights = [profile[2] for profile in FILE_PROFILES]
+    total_bytes = 0
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'index.html'), 'wb') as file:
+        file.write(text_bytes(2048, rng))
+
+    for index in range(1, files):
+        directory, ext, _, median, sigma, is_text = rng.choices(FILE_PROFILES, weights)[0]
+        size = min(int(rng.lognormvariate(0, sigma) * median), MAX_FILE_SIZE)
+        if directory:
+            directory = os.path.join(directory, str(index // FILES_PER_DIRECTORY))
+        name = f'chunk{index}-{rng.getrandbits(32):08x}{ext}' if ext in ('.js', '.css', '.map') else f'file{index}{ext}'
+        path = os.path.join(root, directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(text_bytes(size, rng) if is_text else rng.randbytes(size))
+        total_bytes += size
+    return total_bytes
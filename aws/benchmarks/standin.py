@@ -0,0 +1,165 @@
+import hashlib
+import io
+import threading
+import time
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from urllib3 import HTTPResponse
+
+
+class LatencyInjector:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def register(self, session):
+        session.events.register('before-send', self.delay)
+
+    def delay(self, **kwargs):
+        time.sleep(self.latency)
+
+
+class S3Throttle:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+    def register(self, session):
+        session.events.register_last('before-send.s3', self.admit)
+
+    def admit(self, request, **kwargs):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            self.throttled += 1
+        body = b'<?xml version="1.0" encoding="UTF-8"?><Error><Code>SlowDown</Code><Message>Please reduce your request rate.</Message></Error>'
+        return AWSResponse(request.url, 503, {'Content-Type': 'application/xml'}, HTTPResponse(body=io.BytesIO(body), preload_content=False))
+
+
+class CloudFrontStandIn:
+    OPERATIONS = ()
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def register(self, session):
+        for operation in self.OPERATIONS:
+            session.events.register(f'before-parameter-build.cloudfront.{operation}', self.capture_params)
+            session.events.register_last(f'before-call.cloudfront.{operation}', self.handle)
+
+    def capture_params(self, params, context, **kwargs):
+        context['standin_params'] = dict(params)
+
+    def handle(self, model, context, **kwargs):
+        time.sleep(self.latency)
+        try:
+            parsed = getattr(self, model.name)(**context['standin_params'])
+        except ClientError as e:
+            return AWSResponse('', 404, {}, None), dict(e.response, ResponseMetadata={'HTTPStatusCode': 404})
+        parsed['ResponseMetadata'] = {'HTTPStatusCode': 200, 'HTTPHeaders': {}, 'RetryAttempts': 0}
+        return AWSResponse('', 200, {}, None), parsed
+
+
+class CloudFrontFunctionStandIn(CloudFrontStandIn):
+    OPERATIONS = ('ListFunctions', 'CreateFunction', 'DescribeFunction', 'GetFunction', 'UpdateFunction', 'PublishFunction')
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.functions = {}
+
+    def _summary(self, name, stage='DEVELOPMENT'):
+        function = self.functions[name]
+        return {
+            'Name': name,
+            'Status': 'UNASSOCIATED',
+            'FunctionConfig': function['FunctionConfig'],
+            'FunctionMetadata': {
+                'FunctionARN': f'arn:aws:cloudfront::123456789012:function/{name}',
+                'Stage': stage,
+                'LastModifiedTime': function['LastModifiedTime']
+            }
+        }
+
+    def _get(self, name, stage='DEVELOPMENT'):
+        function = self.functions.get(name)
+        if function is None or stage not in function['stages']:
+            raise ClientError({'Error': {'Code': 'NoSuchFunctionExists', 'Message': name}}, 'GetFunction')
+        return function['stages'][stage]
+
+    def _check_etag(self, name, etag):
+        if self._get(name)['ETag'] != etag:
+            raise ClientError({'Error': {'Code': 'PreconditionFailed', 'Message': name}}, 'UpdateFunction')
+
+    def _store(self, name, code, config):
+        code = code if isinstance(code, bytes) else code.encode('utf-8')
+        function = self.functions.setdefault(name, {'stages': {}})
+        function['FunctionConfig'] = config
+        function['LastModifiedTime'] = time.time()
+        function['stages']['DEVELOPMENT'] = {'Code': code, 'ETag': hashlib.md5(code + str(time.time_ns()).encode()).hexdigest()}
+        return {'FunctionSummary': self._summary(name), 'ETag': function['stages']['DEVELOPMENT']['ETag']}
+
+    def ListFunctions(self, **params):
+        items = [self._summary(name) for name in self.functions]
+        return {'FunctionList': {'MaxItems': 100, 'Quantity': len(items), 'Items': items}}
+
+    def CreateFunction(self, Name, FunctionConfig, FunctionCode):
+        return self._store(Name, FunctionCode, FunctionConfig)
+
+    def UpdateFunction(self, Name, IfMatch, FunctionConfig, FunctionCode):
+        self._check_etag(Name, IfMatch)
+        return self._store(Name, FunctionCode, FunctionConfig)
+
+    def DescribeFunction(self, Name, Stage='DEVELOPMENT'):
+        etag = self._get(Name, Stage)['ETag']
+        return {'FunctionSummary': self._summary(Name, Stage), 'ETag': etag}
+
+    def GetFunction(self, Name, Stage='DEVELOPMENT'):
+        stage = self._get(Name, Stage)
+        return {
+            'FunctionCode': StreamingBody(io.BytesIO(stage['Code']), len(stage['Code'])),
+            'ETag': stage['ETag'],
+            'ContentType': 'application/octet-stream'
+        }
+
+    def PublishFunction(self, Name, IfMatch):
+        self._check_etag(Name, IfMatch)
+        function = self.functions[Name]
+        function['stages']['LIVE'] = dict(function['stages']['DEVELOPMENT'])
+        return {'FunctionSummary': self._summary(Name, 'LIVE')}
+
+
+class CloudFrontPolicyStandIn(CloudFrontStandIn):
+    OPERATIONS = ('ListCachePolicies', 'CreateCachePolicy', 'GetCachePolicyConfig', 'UpdateCachePolicy',
+                  'ListOriginRequestPolicies', 'CreateOriginRequestPolicy', 'GetOriginRequestPolicyConfig', 'UpdateOriginRequestPolicy')
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.policies = {'CachePolicy': {}, 'OriginRequestPolicy': {}}
+
+    def handle(self, model, context, **kwargs):
+        time.sleep(self.latency)
+        name = model.name
+        policy_type = 'CachePolicy' if 'Cache' in name else 'OriginRequestPolicy'
+        policies = self.policies[policy_type]
+        params = context['standin_params']
+        if name.startswith('List'):
+            items = [{'Type': 'custom', policy_type: policy} for policy in policies.values()]
+            parsed = {f'{policy_type}List': {'MaxItems': 100, 'Quantity': len(items), 'Items': items}}
+        elif name.startswith('Get'):
+            if params['Id'] not in policies:
+                error = {'Error': {'Code': f'NoSuch{policy_type}', 'Message': params['Id']}, 'ResponseMetadata': {'HTTPStatusCode': 404}}
+                return AWSResponse('', 404, {}, None), error
+            parsed = {f'{policy_type}Config': policies[params['Id']][f'{policy_type}Config'], 'ETag': 'E1'}
+        else:
+            policy_id = params.get('Id') or hashlib.md5(params[f'{policy_type}Config']['Name'].encode()).hexdigest()[:14].upper()
+            policies[policy_id] = {'Id': policy_id, 'LastModifiedTime': time.time(), f'{policy_type}Config': params[f'{policy_type}Config']}
+            parsed = {policy_type: policies[policy_id], 'ETag': 'E1'}
+        parsed['ResponseMetadata'] = {'HTTPStatusCode': 200, 'HTTPHeaders': {}, 'RetryAttempts': 0}
+        return AWSResponse('', 200, {}, None), parsed
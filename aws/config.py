@@ -1,5 +1,32 @@
 AWS_REGION = 'us-west-2'
 BUCKET_NAME = 'dvdve'
-FOLDER_PATH = '/Users/siddarthreddy/workspace/pub_01/poc01/frontend'
+FOLDER_PATH = '/Users/siddarthreddy/workspace/pub_01/poc01/frontend'  # directory, .zip/.tar.gz build archive, or '-' for stdin
+ARCHIVE_STRIP_COMPONENTS = 0  # leading directories to drop from archive member paths, like tar --strip-components
 CLOUDFRONT_FUNCTION_NAME = "backendredirection"
 EC2_ENDPOINT = '3.126.6.201:5000'
+UPLOAD_WORKERS = 16
+SYNC_MODE = True
+SYNC_DELETE_ORPHANS = False
+MANIFEST_DIR = '.deploy'
+UPLOAD_MODE = 'file'  # 'file' or 'stream' (memory-mapped, bounded by TRANSFER_MAX_BUFFER_BYTES)
+TRANSFER_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+TRANSFER_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+TRANSFER_MAX_CONCURRENCY = 10
+TRANSFER_USE_THREADS = True
+TRANSFER_MAX_BUFFER_BYTES = 256 * 1024 * 1024
+PRECOMPRESS = False  # store compressible files gzip-encoded; CloudFront serves them as-is, so clients that send no Accept-Encoding get gzip
+PRECOMPRESS_ENCODINGS = ('gzip',)  # add 'br' (needs the brotli package) only if every client sends Accept-Encoding: br
+INVALIDATE_ON_DEPLOY = True
+WAIT_FOR_DEPLOYMENT = False
+TRACE_PATH = None  # e.g. 'deploy-trace.json'; Chrome trace format, open in chrome://tracing or Perfetto
+RESUMABLE_DEPLOYS = True
+STATE_CACHE = True  # read remote state in one batched pass (cached in MANIFEST_DIR) and only apply the diff; main.py --plan prints it
+GC_KEEP_DEPLOYS = None  # e.g. 3: delete objects not referenced by the last N deploys
+GC_GRACE_PERIOD = 7 * 24 * 3600
+GC_DRY_RUN = True
+RELEASES = False  # upload each deploy to releases/<id>/ and cut over by switching the CloudFront origin path
+ACCESS_LOG_BUCKET = None  # e.g. 'my-site-logs'; enables CloudFront standard logging, analyze with main.analyze_access_logs
+ACCESS_LOG_PREFIX = 'cloudfront/'
+SITES = []  # e.g. [{'bucket_name': 'tenant-a', 'folder_path': '/srv/a/dist', 'region': 'eu-central-1'}]; overrides the single site above
+DEPLOY_PROCESSES = 4
+SERVICE_CONCURRENCY = {'s3': 64, 'cloudfront': 4, 'sts': 4}  # in-flight requests per service across all deploy processes
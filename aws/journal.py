@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+
+
+class DeployJournal:
+    def __init__(self, path, deploy):
+        self.path = path
+        self.deploy = deploy
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.objects = {}
+        self.multipart = {}
+        self.started = time.time()
+        self.resumed = False
+        self._replay()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'a')
+        if not self.resumed:
+            self._append({'type': 'deploy', 'deploy': deploy, 'started': self.started})
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        records = []
+        with open(self.path, 'r') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        if not records or records[0].get('type') != 'deploy' or records[0].get('deploy') != self.deploy:
+            os.remove(self.path)
+            return
+
+        self.resumed = True
+        self.started = records[0]['started']
+        for record in records[1:]:
+            kind = record['type']
+            if kind == 'stage':
+                self.stages[record['name']] = record['result']
+            elif kind == 'object':
+                self.objects[record['key']] = record['digest']
+            elif kind == 'multipart':
+                self.multipart[record['upload_id']] = {'key': record['key'], 'digest': record['digest'], 'parts': {}}
+            elif kind == 'part' and record['upload_id'] in self.multipart:
+                self.multipart[record['upload_id']]['parts'][record['part']] = record['etag']
+            elif kind == 'multipart_done':
+                self.multipart.pop(record['upload_id'], None)
+        print(f'Resuming deploy: {len(self.stages)} stages, {len(self.objects)} objects and '
+              f'{len(self.multipart)} multipart uploads recorded in {self.path}.')
+
+    def _append(self, record):
+        self._write(json.dumps(record))
+
+    def _write(self, line):
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def stage_done(self, name):
+        return name in self.stages
+
+    def record_stage(self, name, result):
+        try:
+            record = json.dumps({'type': 'stage', 'name': name, 'result': result})
+        except TypeError:
+            print(f'Not journaling stage {name}: its result is not JSON-serializable, so a resumed deploy re-runs it.')
+            return
+        self.stages[name] = result
+        self._write(record)
+
+    def object_done(self, key, digest):
+        return self.objects.get(key) == digest
+
+    def record_object(self, key, digest):
+        with self.lock:
+            self.objects[key] = digest
+        self._append({'type': 'object', 'key': key, 'digest': digest})
+
+    def pending_multipart(self, key, digest):
+        with self.lock:
+            for upload_id, upload in self.multipart.items():
+                if upload['key'] == key and upload['digest'] == digest:
+                    return upload_id, dict(upload['parts'])
+        return None, {}
+
+    def record_multipart(self, key, digest, upload_id):
+        with self.lock:
+            self.multipart[upload_id] = {'key': key, 'digest': digest, 'parts': {}}
+        self._append({'type': 'multipart', 'key': key, 'digest': digest, 'upload_id': upload_id})
+
+    def record_part(self, upload_id, part_number, etag):
+        with self.lock:
+            self.multipart[upload_id]['parts'][part_number] = etag
+        self._append({'type': 'part', 'upload_id': upload_id, 'part': part_number, 'etag': etag})
+
+    def record_multipart_done(self, upload_id):
+        with self.lock:
+            self.multipart.pop(upload_id, None)
+        self._append({'type': 'multipart_done', 'upload_id': upload_id})
+
+    def tracked_upload_ids(self):
+        with self.lock:
+            return set(self.multipart)
+
+    def finish(self):
+        self.close()
+        os.remove(self.path)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
@@ -1,35 +1,387 @@
+import argparse
+import contextlib
+import hashlib
+import json
 import os
-import boto3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from services.clients import ClientFactory
+from services.instrumentation import Tracer
+from services.limits import RequestLimiter, create_request_slots, print_limiter_metrics
 from services.s3.operations import S3Operations
+from services.s3.archive import is_archive_source
+from services.s3.gc import HISTORY_PREFIX, DeploymentHistory
+from services.s3.releases import ReleaseManager
+from services.s3.scanner import tree_fingerprint
 from services.cloudfront.operations import CloudFrontOperations
+from services.cloudfront.logs import analyze_bucket
+from journal import DeployJournal
+from orchestrator import DeployOrchestrator
+from plan import DeployState
 import config
 
 
-def setup_static_website(bucket_name, folder_path, cloudfrontfunction_name, ec2_endpoint, region):
-    session = boto3.Session(
+def setup_static_website(bucket_name, folder_path, cloudfrontfunction_name, ec2_endpoint, region, upload_workers=16,
+                         sync=False, delete_orphans=False, manifest_dir='.deploy', upload_mode='file', transfer_options=None,
+                         compress=False, compress_encodings=('gzip',), invalidate=True, wait_for_deployment=False,
+                         trace_path=None, resumable=False, gc_keep_deploys=None, gc_grace_period=7 * 24 * 3600, gc_dry_run=True,
+                         releases=False, log_bucket_name=None, log_prefix='', limiter=None,
+                         archive_strip_components=0, use_state=True, plan_only=False, refresh_state=False):
+    tracer = Tracer() if trace_path else None
+    clients = ClientFactory(
+        tracer=tracer,
+        limiter=limiter,
         aws_access_key_id=os.environ.get('ACCESS_KEY'),
         aws_secret_access_key=os.environ.get('SECRET_KEY'),
         region_name=region
     )
 
-    s3_ops = S3Operations(session, region)
-    cloudfront_ops = CloudFrontOperations(session)
+    archive = is_archive_source(folder_path)
+    if archive and releases:
+        raise SystemExit('Release deploys need a directory source; extract the archive first.')
 
-    s3_ops.create_bucket(bucket_name)
-    s3_ops.upload_files(bucket_name, folder_path)
+    s3_ops = S3Operations(clients, region, max_workers=upload_workers, upload_mode=upload_mode,
+                          compress=compress, compress_encodings=compress_encodings)
+    if transfer_options:
+        s3_ops.configure_transfer(**transfer_options)
+    cloudfront_ops = CloudFrontOperations(clients)
 
-    distribution_id = cloudfront_ops.setup_cloudfront(bucket_name, region, cloudfrontfunction_name, ec2_endpoint)
+    journal = None
+    if resumable and not archive and not plan_only:
+        options = {
+            'region': region, 'sync': sync, 'delete_orphans': delete_orphans, 'upload_mode': upload_mode,
+            'transfer_options': transfer_options, 'compress': compress, 'compress_encodings': list(compress_encodings),
+            'invalidate': invalidate, 'releases': releases, 'log_bucket_name': log_bucket_name, 'log_prefix': log_prefix
+        }
+        deploy = {
+            'bucket': bucket_name,
+            'folder': os.path.abspath(folder_path),
+            'tree': tree_fingerprint(folder_path),
+            'function': cloudfrontfunction_name,
+            'endpoint': ec2_endpoint,
+            'function_code': hashlib.sha256(cloudfront_ops.render_function_code(cloudfrontfunction_name, ec2_endpoint)).hexdigest(),
+            'metadata_rules': s3_ops.metadata_rules.digest(),
+            'options': hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+        }
+        journal = DeployJournal(os.path.join(manifest_dir, f'{bucket_name}.journal'), deploy)
+        s3_ops.journal = journal
 
-    sts_client = session.client('sts')
-    account_id = sts_client.get_caller_identity()['Account']
-    s3_ops.update_bucket_policy(bucket_name, distribution_id, account_id)
+    release_manager = ReleaseManager(s3_ops, bucket_name) if releases else None
+
+    plan = None
+    if use_state:
+        state = DeployState(clients, s3_ops, cloudfront_ops, bucket_name, region, cloudfrontfunction_name, ec2_endpoint,
+                            os.path.join(manifest_dir, f'{bucket_name}.state.json'), log_bucket_name, log_prefix)
+        snapshot = state.read(refresh_state)
+        content = None
+        if plan_only and sync and not archive and not releases and snapshot['bucket'] == 'owned':
+            content = s3_ops.plan_sync(bucket_name, folder_path, os.path.join(manifest_dir, f'{bucket_name}.json'),
+                                       os.path.join(manifest_dir, 'digests.json'))
+        plan = state.plan(snapshot, content, delete_orphans)
+        if plan_only and content is None:
+            plan.add('objects', 'upload', f'all files from {folder_path}')
+        plan.print()
+        if plan_only:
+            return snapshot['distribution']['id'] if snapshot['distribution'] else None
+    elif plan_only:
+        raise SystemExit('Planning needs the remote-state snapshot; enable STATE_CACHE.')
+
+    def needed(resource):
+        return plan is None or plan.changed(resource)
+
+    def ensure_bucket(results):
+        if needed('bucket'):
+            s3_ops.create_bucket(bucket_name)
+
+    def ensure_oac(results):
+        return cloudfront_ops.get_or_create_origin_access_control() if needed('oac') else snapshot['oac']
+
+    def ensure_distribution(results):
+        if plan is not None and snapshot['distribution']:
+            return snapshot['distribution']['id']
+        return cloudfront_ops.ensure_distribution(bucket_name, region, results['oac'])
+
+    def ensure_function(results):
+        if needed('function'):
+            return cloudfront_ops.create_or_update_cloudfront_function(cloudfrontfunction_name, ec2_endpoint)
+        print(f"Function '{cloudfrontfunction_name}' is unchanged.")
+
+    def ensure_policies(results):
+        if needed('policies'):
+            return cloudfront_ops.ensure_policies()
+        return {kind: {alias: policy['id'] for alias, policy in aliases.items()} for kind, aliases in snapshot['policies'].items()}
+
+    def configure(results):
+        if not needed('distribution'):
+            print(f"Distribution '{results['distribution']}' is already up to date.")
+            return
+        cloudfront_ops.configure_distribution(results['distribution'], bucket_name, region, results['oac'], cloudfrontfunction_name,
+                                              results['policies'], log_bucket_name=log_bucket_name, log_prefix=log_prefix)
+
+    def ensure_bucket_policy(results):
+        if needed('bucket_policy'):
+            s3_ops.update_bucket_policy(bucket_name, results['distribution'], results['account'])
+
+    def ensure_log_bucket(results):
+        if needed('log_bucket'):
+            s3_ops.create_log_bucket(log_bucket_name)
+
+    def upload(results):
+        if releases:
+            published = release_manager.list_releases()
+            summary = release_manager.publish(folder_path, published[-1] if published else None,
+                                              digest_cache_path=os.path.join(manifest_dir, 'digests.json'))
+        elif archive:
+            remote_etags = None
+            if sync:
+                remote_objects = s3_ops.list_objects(bucket_name)
+                remote_etags = {s3_key: remote['ETag'] for s3_key, remote in remote_objects.items()}
+            summary = s3_ops.upload_archive(bucket_name, folder_path, strip_components=archive_strip_components, remote_etags=remote_etags)
+            summary['deleted'] = []
+            if sync and delete_orphans:
+                keys = set(summary['keys'])
+                orphans = [s3_key for s3_key in remote_objects if s3_key not in keys and not s3_key.startswith(f'{HISTORY_PREFIX}/')]
+                summary['deleted'] = s3_ops.delete_objects(bucket_name, orphans)
+        elif sync:
+            manifest_path = os.path.join(manifest_dir, f'{bucket_name}.json')
+            summary = s3_ops.sync_files(bucket_name, folder_path, delete=delete_orphans, manifest_path=manifest_path,
+                                        digest_cache_path=os.path.join(manifest_dir, 'digests.json'))
+        else:
+            summary = s3_ops.upload_files(bucket_name, folder_path)
+        if summary['errors']:
+            raise SystemExit(f"Aborting deploy: {len(summary['errors'])} files failed to upload.")
+        if gc_keep_deploys:
+            history = DeploymentHistory(s3_ops.s3_client, bucket_name)
+            history.record(summary['keys'])
+            history.prune(gc_keep_deploys)
+        return summary
+
+    def collect_garbage(results):
+        return s3_ops.collect_garbage(bucket_name, keep=gc_keep_deploys, grace_period=gc_grace_period, dry_run=gc_dry_run)
+
+    def cutover(results):
+        release_id = results['upload']['release']
+        previous = cloudfront_ops.set_origin_path(results['distribution'], bucket_name, region, release_manager.origin_path(release_id))
+        return {'release': release_id, 'previous': release_manager.release_id_from_origin_path(previous)}
+
+    def invalidate_changes(results):
+        summary = results['upload']
+        if releases:
+            changed_keys = release_manager.changed_keys(results['cutover']['previous'], results['cutover']['release'])
+        else:
+            changed_keys = summary['modified'] + summary['deleted'] if sync else summary['uploaded']
+        if journal and journal.resumed:
+            changed_keys = sorted(set(changed_keys) | set(journal.objects))
+        return cloudfront_ops.invalidate(results['distribution'], changed_keys)
+
+    def wait_until_live(results):
+        invalidation = results.get('invalidate')
+        invalidation_ids = [invalidation['Id']] if invalidation else []
+        rollout = cloudfront_ops.wait_for_deployment(results['distribution'], invalidation_ids)
+        return {f'{kind}:{resource_id}': status for (kind, resource_id), status in rollout.items()}
+
+    orchestrator = DeployOrchestrator(tracer=tracer, journal=journal)
+    orchestrator.add_step('bucket', ensure_bucket)
+    orchestrator.add_step('upload', upload, depends_on=['bucket'])
+    orchestrator.add_step('oac', ensure_oac)
+    orchestrator.add_step('distribution', ensure_distribution, depends_on=['oac'])
+    orchestrator.add_step('function', ensure_function)
+    orchestrator.add_step('policies', ensure_policies)
+    if log_bucket_name:
+        orchestrator.add_step('log_bucket', ensure_log_bucket)
+    orchestrator.add_step('configure', configure,
+                          depends_on=['oac', 'distribution', 'function', 'policies'] + (['log_bucket'] if log_bucket_name else []))
+    orchestrator.add_step('account', lambda results: snapshot['account'] if plan is not None else clients.account_id())
+    orchestrator.add_step('bucket_policy', ensure_bucket_policy, depends_on=['bucket', 'distribution', 'account'])
+    live_dependencies = ['upload', 'configure', 'bucket_policy']
+    if releases:
+        orchestrator.add_step('cutover', cutover, depends_on=live_dependencies)
+        live_dependencies = live_dependencies + ['cutover']
+    if invalidate:
+        orchestrator.add_step('invalidate', invalidate_changes, depends_on=live_dependencies)
+    if gc_keep_deploys:
+        gc_dependencies = ['upload'] + (['cutover'] if releases else []) + (['invalidate'] if invalidate else [])
+        orchestrator.add_step('gc', collect_garbage, depends_on=gc_dependencies)
+    if wait_for_deployment:
+        orchestrator.add_step('live', wait_until_live, depends_on=live_dependencies + (['invalidate'] if invalidate else []))
+
+    try:
+        orchestrator.run()
+        orchestrator.report()
+        if journal:
+            journal.finish()
+        if plan is not None and plan.changes:
+            state.remember(snapshot, {name: orchestrator.results.get(name) for name in ('oac', 'distribution', 'function', 'policies')
+                                      if plan.changed(name)})
+    finally:
+        if journal:
+            journal.close()
+        print_limiter_metrics()
+        if tracer:
+            tracer.print_summary()
+            tracer.write(trace_path)
+    return orchestrator.results['distribution']
+
+
+def rollback_release(bucket_name, region, release_id=None, invalidate=True):
+    clients = ClientFactory(
+        aws_access_key_id=os.environ.get('ACCESS_KEY'),
+        aws_secret_access_key=os.environ.get('SECRET_KEY'),
+        region_name=region
+    )
+    release_manager = ReleaseManager(S3Operations(clients, region), bucket_name)
+    cloudfront_ops = CloudFrontOperations(clients)
+    distribution_id, _ = cloudfront_ops.get_existing_distribution(bucket_name, region)
+    if not distribution_id:
+        raise SystemExit(f'No CloudFront distribution found for bucket {bucket_name}.')
+
+    domain_name = f'{bucket_name}.s3.{region}.amazonaws.com'
+    current = release_manager.release_id_from_origin_path(cloudfront_ops.get_origin_path(distribution_id, domain_name))
+    published = release_manager.list_releases()
+    if release_id is None:
+        older = published[:published.index(current)] if current in published else []
+        if not older:
+            raise SystemExit(f'No release older than {current} to roll back to.')
+        release_id = older[-1]
+    elif release_id not in published:
+        raise SystemExit(f'Release {release_id} is not published in {bucket_name}.')
+
+    cloudfront_ops.set_origin_path(distribution_id, bucket_name, region, release_manager.origin_path(release_id))
+    if invalidate:
+        cloudfront_ops.invalidate(distribution_id, release_manager.changed_keys(current, release_id))
+    return release_id
+
+
+def analyze_access_logs(log_bucket_name, region, prefix='', prefix_depth=1, limit=20):
+    clients = ClientFactory(
+        aws_access_key_id=os.environ.get('ACCESS_KEY'),
+        aws_secret_access_key=os.environ.get('SECRET_KEY'),
+        region_name=region
+    )
+    aggregator = analyze_bucket(clients.client('s3'), log_bucket_name, prefix, prefix_depth)
+    aggregator.print_report(limit)
+    return aggregator
+
+
+_worker_limiter = None
+
+
+def _init_deploy_worker(request_slots):
+    global _worker_limiter
+    _worker_limiter = RequestLimiter(request_slots)
+
+
+def _deploy_site(site, log_dir):
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{site['bucket_name']}-{site['region']}.log")
+    start = time.monotonic()
+    result = {'bucket': site['bucket_name'], 'region': site['region'], 'log': log_path}
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            result['distribution'] = setup_static_website(limiter=_worker_limiter, **site)
+            result['status'] = 'ok'
+        except BaseException as e:
+            result['status'] = 'failed'
+            result['error'] = str(e) or type(e).__name__
+    result['seconds'] = time.monotonic() - start
+    return result
+
+
+def ensure_shared_resources(targets):
+    clients = ClientFactory(
+        aws_access_key_id=os.environ.get('ACCESS_KEY'),
+        aws_secret_access_key=os.environ.get('SECRET_KEY'),
+        region_name=targets[0]['region']
+    )
+    cloudfront_ops = CloudFrontOperations(clients)
+
+    functions = {}
+    for target in targets:
+        name = target['cloudfrontfunction_name']
+        code = cloudfront_ops.render_function_code(name, target['ec2_endpoint'])
+        endpoint = functions.setdefault(name, (code, target['ec2_endpoint']))[1]
+        if functions[name][0] != code:
+            raise SystemExit(f"Sites share the CloudFront function '{name}' but render it with different endpoints "
+                             f"({endpoint} and {target['ec2_endpoint']}); give each endpoint its own cloudfrontfunction_name.")
+
+    # the OAC, functions and policies are account-global, so create them once instead of racing in every worker
+    cloudfront_ops.get_or_create_origin_access_control()
+    cloudfront_ops.ensure_policies()
+    for name, (_, endpoint) in functions.items():
+        cloudfront_ops.create_or_update_cloudfront_function(name, endpoint)
+
+
+def deploy_sites(sites, defaults=None, max_processes=4, service_concurrency=None, log_dir='.deploy/logs'):
+    targets = [dict(defaults or {}, **site) for site in sites]
+    ensure_shared_resources(targets)
+    request_slots = create_request_slots(service_concurrency or {})
+    start = time.monotonic()
+    results = []
+    with ProcessPoolExecutor(max_workers=min(max_processes, len(targets)), initializer=_init_deploy_worker,
+                             initargs=(request_slots,)) as executor:
+        futures = [executor.submit(_deploy_site, target, log_dir) for target in targets]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"{result['bucket']} ({result['region']}): {result['status']} in {result['seconds']:.1f}s")
+    wall = time.monotonic() - start
+
+    print(f"{'bucket':<32} {'region':<14} {'status':<8} {'seconds':>8}  distribution / error")
+    for result in sorted(results, key=lambda result: (result['bucket'], result['region'])):
+        detail = result.get('distribution') if result['status'] == 'ok' else f"{result['error']} (see {result['log']})"
+        print(f"{result['bucket']:<32} {result['region']:<14} {result['status']:<8} {result['seconds']:>8.1f}  {detail}")
+    print(f"{len(results)} sites deployed in {wall:.1f}s wall time "
+          f"({sum(result['seconds'] for result in results):.1f}s summed across sites).")
+    return results
+
+
+def config_options():
+    return {
+        'upload_workers': config.UPLOAD_WORKERS,
+        'sync': config.SYNC_MODE,
+        'delete_orphans': config.SYNC_DELETE_ORPHANS,
+        'manifest_dir': config.MANIFEST_DIR,
+        'upload_mode': config.UPLOAD_MODE,
+        'transfer_options': {
+            'multipart_threshold': config.TRANSFER_MULTIPART_THRESHOLD,
+            'multipart_chunksize': config.TRANSFER_MULTIPART_CHUNKSIZE,
+            'max_concurrency': config.TRANSFER_MAX_CONCURRENCY,
+            'use_threads': config.TRANSFER_USE_THREADS,
+            'max_buffer_bytes': config.TRANSFER_MAX_BUFFER_BYTES
+        },
+        'compress': config.PRECOMPRESS,
+        'compress_encodings': config.PRECOMPRESS_ENCODINGS,
+        'invalidate': config.INVALIDATE_ON_DEPLOY,
+        'wait_for_deployment': config.WAIT_FOR_DEPLOYMENT,
+        'trace_path': config.TRACE_PATH,
+        'resumable': config.RESUMABLE_DEPLOYS,
+        'gc_keep_deploys': config.GC_KEEP_DEPLOYS,
+        'gc_grace_period': config.GC_GRACE_PERIOD,
+        'gc_dry_run': config.GC_DRY_RUN,
+        'releases': config.RELEASES,
+        'log_bucket_name': config.ACCESS_LOG_BUCKET,
+        'log_prefix': config.ACCESS_LOG_PREFIX,
+        'archive_strip_components': config.ARCHIVE_STRIP_COMPONENTS,
+        'use_state': config.STATE_CACHE
+    }
 
 
 if __name__ == "__main__":
-    bucket_name = config.BUCKET_NAME
-    folder_path = config.FOLDER_PATH
-    cloudfrontfunction_name = config.CLOUDFRONT_FUNCTION_NAME
-    ec2_endpoint = config.EC2_ENDPOINT
-    region = config.AWS_REGION
+    parser = argparse.ArgumentParser(description='Deploy the static site and its CloudFront distribution.')
+    parser.add_argument('--plan', action='store_true', help='Print the changes a deploy would make without applying them.')
+    parser.add_argument('--refresh', action='store_true', help='Ignore the cached remote-state snapshot and re-read everything.')
+    args = parser.parse_args()
 
-    setup_static_website(bucket_name, folder_path, cloudfrontfunction_name, ec2_endpoint, region)
+    if config.SITES:
+        defaults = dict(config_options(), cloudfrontfunction_name=config.CLOUDFRONT_FUNCTION_NAME, ec2_endpoint=config.EC2_ENDPOINT,
+                        region=config.AWS_REGION, trace_path=None, refresh_state=args.refresh)
+        if args.plan:
+            for site in config.SITES:
+                target = dict(defaults, **site)
+                print(f"== {target['bucket_name']} ({target['region']})")
+                setup_static_website(plan_only=True, **target)
+        else:
+            deploy_sites(config.SITES, defaults, config.DEPLOY_PROCESSES, config.SERVICE_CONCURRENCY)
+    else:
+        setup_static_website(config.BUCKET_NAME, config.FOLDER_PATH, config.CLOUDFRONT_FUNCTION_NAME, config.EC2_ENDPOINT,
+                             config.AWS_REGION, plan_only=args.plan, refresh_state=args.refresh, **config_options())
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+
+class DeployOrchestrator:
+    def __init__(self, max_workers=8, tracer=None, journal=None):
+        self.max_workers = max_workers
+        self.tracer = tracer
+        self.journal = journal
+        self.steps = {}
+        self.results = {}
+        self.timings = {}
+
+    def add_step(self, name, fn, depends_on=()):
+        if name in self.steps:
+            raise ValueError(f'Step {name} is already defined.')
+        self.steps[name] = (fn, tuple(depends_on))
+
+    def ordered_steps(self):
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f'Dependency cycle detected at step {name}.')
+            if name not in self.steps:
+                raise ValueError(f'Unknown step {name}.')
+            visiting.add(name)
+            for dependency in self.steps[name][1]:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(name)
+
+        for name in self.steps:
+            visit(name)
+        return ordered
+
+    def run(self):
+        return asyncio.run(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        self.start = time.monotonic()
+        tasks = {}
+
+        async def run_step(name):
+            fn, depends_on = self.steps[name]
+            await asyncio.gather(*(tasks[dependency] for dependency in depends_on))
+            started = time.monotonic() - self.start
+            self.results[name] = await loop.run_in_executor(executor, self._run_step, name, fn)
+            self.timings[name] = (started, time.monotonic() - self.start)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for name in self.ordered_steps():
+                tasks[name] = asyncio.ensure_future(run_step(name))
+            try:
+                await asyncio.gather(*tasks.values())
+            except BaseException:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+                raise
+        self.elapsed = time.monotonic() - self.start
+        return self.results
+
+    def _run_step(self, name, fn):
+        if self.journal and self.journal.stage_done(name):
+            print(f'Skipping step {name}, completed by the interrupted deploy.')
+            return self.journal.stages[name]
+        with self.tracer.stage(name) if self.tracer else nullcontext():
+            result = fn(self.results)
+        if self.journal:
+            self.journal.record_stage(name, result)
+        return result
+
+    def critical_path(self):
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda step: self.timings[step][1])
+        path = [name]
+        while self.steps[name][1]:
+            name = max(self.steps[name][1], key=lambda step: self.timings[step][1])
+            path.append(name)
+        return list(reversed(path))
+
+    def report(self):
+        print(f'Deploy finished in {self.elapsed:.2f}s')
+        for name, (started, finished) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            print(f'  {name:<24} {started:8.2f}s -> {finished:8.2f}s ({finished - started:.2f}s)')
+        print(f"Critical path: {' -> '.join(self.critical_path())}")
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from services.cloudfront.operations import OAC_NAME, POLICY_TYPES
+from services.cloudfront.policies import default_policies
+
+STATE_VERSION = 1
+PLACEHOLDER = '(known after apply)'
+
+
+def config_diff(before, after, path=''):
+    if isinstance(before, dict) and isinstance(after, dict):
+        changes = []
+        for key in sorted(set(before) | set(after)):
+            changes.extend(config_diff(before.get(key), after.get(key), f'{path}.{key}' if path else key))
+        return changes
+    return [] if before == after else [path]
+
+
+class DeployPlan:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.changes = []
+
+    def add(self, resource, action, detail=''):
+        self.changes.append((resource, action, detail))
+
+    def changed(self, resource):
+        return any(change[0] == resource for change in self.changes)
+
+    def print(self):
+        if not self.changes:
+            print('Plan: no changes. Remote state matches the configuration.')
+            return
+        print(f'Plan: {len(self.changes)} changes')
+        for resource, action, detail in self.changes:
+            print(f'  {action:<8} {resource:<14} {detail}')
+
+
+class DeployState:
+    def __init__(self, clients, s3_ops, cloudfront_ops, bucket_name, region, function_name, ec2_endpoint, cache_path,
+                 log_bucket_name=None, log_prefix=''):
+        self.clients = clients
+        self.s3_ops = s3_ops
+        self.cloudfront_ops = cloudfront_ops
+        self.bucket_name = bucket_name
+        self.region = region
+        self.function_name = function_name
+        self.ec2_endpoint = ec2_endpoint
+        self.cache_path = cache_path
+        self.log_bucket_name = log_bucket_name
+        self.log_prefix = log_prefix
+
+    def credential_key(self):
+        credentials = self.clients.session.get_credentials()
+        access_key = credentials.access_key if credentials else ''
+        return hashlib.sha256(access_key.encode()).hexdigest()[:16]
+
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        with open(self.cache_path, 'r') as file:
+            cached = json.load(file)
+        if cached.get('version') != STATE_VERSION or cached.get('credentials') != self.credential_key():
+            return {}
+        return cached
+
+    def save(self, snapshot):
+        cached = {
+            'version': STATE_VERSION,
+            'credentials': self.credential_key(),
+            'account': snapshot['account'],
+            'oac': snapshot['oac'],
+            'distribution': {'id': snapshot['distribution']['id'], 'etag': snapshot['distribution']['etag']} if snapshot['distribution'] else None,
+            'function': snapshot['function'],
+            'policies': snapshot['policies']
+        }
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as file:
+            json.dump(cached, file, indent=2, sort_keys=True)
+        os.replace(file.name, self.cache_path)
+
+    def remember(self, snapshot, results):
+        snapshot = dict(snapshot)
+        if results.get('oac'):
+            snapshot['oac'] = results['oac']
+        if results.get('distribution'):
+            snapshot['distribution'] = {'id': results['distribution'], 'etag': None}
+        if results.get('policies'):
+            snapshot['policies'] = {kind: {alias: {'id': results['policies'][kind][alias], 'comment': policy_config['Comment']}
+                                           for alias, policy_config in configs.items()}
+                                    for kind, configs in default_policies().items()}
+        if results.get('function'):
+            # the LIVE ETag changes on publish, so the next read re-downloads the code once
+            snapshot['function'] = None
+        self.save(snapshot)
+
+    def read(self, refresh=False):
+        cached = {} if refresh else self.load()
+        domain_name = f'{self.bucket_name}.s3.{self.region}.amazonaws.com'
+
+        def read_oac():
+            oac_id = cached.get('oac')
+            if oac_id and self.cloudfront_ops.get_origin_access_control(oac_id):
+                return oac_id
+            return self.cloudfront_ops.get_existing_oac(OAC_NAME)
+
+        def read_distribution():
+            distribution_id = (cached.get('distribution') or {}).get('id')
+            if distribution_id:
+                config, etag = self.cloudfront_ops.get_distribution_config(distribution_id)
+                if config and any(origin['DomainName'] == domain_name for origin in config['Origins']['Items']):
+                    return {'id': distribution_id, 'config': config, 'etag': etag}
+            distribution_id, _ = self.cloudfront_ops.get_existing_distribution(self.bucket_name, self.region)
+            if not distribution_id:
+                return None
+            config, etag = self.cloudfront_ops.get_distribution_config(distribution_id)
+            return {'id': distribution_id, 'config': config, 'etag': etag}
+
+        def read_function():
+            etag = self.cloudfront_ops.describe_function_etag(self.function_name, 'LIVE')
+            if etag is None:
+                return None
+            if (cached.get('function') or {}).get('etag') == etag:
+                return cached['function']
+            code, etag = self.cloudfront_ops.get_function_code(self.function_name, 'LIVE')
+            return {'etag': etag, 'digest': hashlib.sha256(code).hexdigest()} if code is not None else None
+
+        def read_policy(kind, alias, name):
+            policy_id = (cached.get('policies') or {}).get(kind, {}).get(alias, {}).get('id')
+            policy_config = self.cloudfront_ops.get_policy_config(kind, policy_id) if policy_id else None
+            if policy_config is None or policy_config['Name'] != name:
+                existing = self.cloudfront_ops.find_policy(kind, name)
+                if existing is None:
+                    return {'id': None, 'comment': None}
+                policy_id = existing['Id']
+                policy_config = existing[f'{POLICY_TYPES[kind]}Config']
+            return {'id': policy_id, 'comment': policy_config.get('Comment')}
+
+        tasks = {
+            'bucket': lambda: self.s3_ops.bucket_state(self.bucket_name),
+            'bucket_policy': lambda: self.s3_ops.get_bucket_policy(self.bucket_name),
+            'account': lambda: cached.get('account') or self.clients.account_id(),
+            'oac': read_oac,
+            'distribution': read_distribution,
+            'function': read_function
+        }
+        if self.log_bucket_name:
+            tasks['log_bucket'] = lambda: self.s3_ops.bucket_state(self.log_bucket_name)
+        for kind, configs in default_policies().items():
+            for alias, policy_config in configs.items():
+                tasks[f'policy:{kind}:{alias}'] = lambda kind=kind, alias=alias, name=policy_config['Name']: read_policy(kind, alias, name)
+
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            futures = {name: executor.submit(task) for name, task in tasks.items()}
+            snapshot = {name: future.result() for name, future in futures.items()}
+
+        snapshot['policies'] = {}
+        for name in [name for name in snapshot if name.startswith('policy:')]:
+            _, kind, alias = name.split(':')
+            snapshot['policies'].setdefault(kind, {})[alias] = snapshot.pop(name)
+        self.save(snapshot)
+        return snapshot
+
+    def plan(self, snapshot, content=None, delete_orphans=False):
+        plan = DeployPlan(snapshot)
+        if snapshot['bucket'] == 'foreign':
+            raise SystemExit(f'Bucket name {self.bucket_name} is already taken. Try a different bucket name.')
+        if snapshot['bucket'] == 'missing':
+            plan.add('bucket', 'create', self.bucket_name)
+        if self.log_bucket_name and snapshot['log_bucket'] != 'owned':
+            plan.add('log_bucket', 'create', self.log_bucket_name)
+        if not snapshot['oac']:
+            plan.add('oac', 'create', OAC_NAME)
+
+        policy_ids = {}
+        for kind, configs in default_policies().items():
+            for alias, policy_config in configs.items():
+                current = snapshot['policies'][kind][alias]
+                policy_ids.setdefault(kind, {})[alias] = current['id'] or PLACEHOLDER
+                if current['id'] is None:
+                    plan.add('policies', 'create', policy_config['Name'])
+                elif current['comment'] != policy_config['Comment']:
+                    plan.add('policies', 'update', policy_config['Name'])
+
+        code_digest = hashlib.sha256(self.cloudfront_ops.render_function_code(self.function_name, self.ec2_endpoint)).hexdigest()
+        if snapshot['function'] is None:
+            plan.add('function', 'create', f'{self.function_name} ({code_digest[:12]})')
+        elif snapshot['function']['digest'] != code_digest:
+            plan.add('function', 'update', f"{self.function_name} ({snapshot['function']['digest'][:12]} -> {code_digest[:12]})")
+
+        distribution = snapshot['distribution']
+        if distribution is None:
+            plan.add('distribution', 'create', f'origin {self.bucket_name}.s3.{self.region}.amazonaws.com')
+        else:
+            mutations = self.cloudfront_ops.distribution_mutations(self.bucket_name, self.region, snapshot['oac'] or PLACEHOLDER, self.function_name,
+                                                                   policy_ids, account_id=snapshot['account'],
+                                                                   log_bucket_name=self.log_bucket_name, log_prefix=self.log_prefix)
+            changed = config_diff(distribution['config'], self.cloudfront_ops.apply_mutations(distribution['config'], mutations))
+            if changed:
+                plan.add('distribution', 'update', f"{distribution['id']}: {', '.join(changed[:6])}{' ...' if len(changed) > 6 else ''}")
+
+        distribution_id = distribution['id'] if distribution else PLACEHOLDER
+        desired_policy = self.s3_ops.bucket_policy_document(self.bucket_name, distribution_id, snapshot['account'])
+        if snapshot['bucket_policy'] != desired_policy:
+            plan.add('bucket_policy', 'put', f'allow {distribution_id} to read {self.bucket_name}')
+
+        if content is not None:
+            if content['added'] or content['modified']:
+                plan.add('objects', 'upload', f"{len(content['added'])} new, {len(content['modified'])} changed")
+            if delete_orphans and content['orphans']:
+                plan.add('objects', 'delete', f"{len(content['orphans'])} orphaned")
+        return plan
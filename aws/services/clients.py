@@ -0,0 +1,54 @@
+import threading
+import boto3
+from botocore.config import Config
+from services.limits import RequestLimiter
+
+
+class ClientFactory:
+    def __init__(self, session=None, max_pool_connections=50, tracer=None, limiter=None, max_attempts=8, **session_kwargs):
+        self.session = session or boto3.Session(**session_kwargs)
+        self.max_pool_connections = max_pool_connections
+        self.tracer = tracer
+        self.limiter = limiter if limiter is not None else RequestLimiter()
+        self.max_attempts = max_attempts
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._caller_identity = None
+
+    @property
+    def region_name(self):
+        return self.session.region_name
+
+    def client(self, service_name, region_name=None, config=None):
+        # clients with different configs (e.g. S3Operations' larger connection pool) must not share a cache entry
+        options = repr(sorted(config._user_provided_options.items())) if config is not None else None
+        key = (service_name, region_name or self.session.region_name, options)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client_config = Config(max_pool_connections=self.max_pool_connections,
+                                       retries={'mode': 'standard', 'max_attempts': self.max_attempts})
+                if config is not None:
+                    client_config = client_config.merge(config)
+                client = self.session.client(service_name, region_name=key[1], config=client_config)
+                if self.tracer is not None:
+                    self.tracer.instrument(client)
+                self.limiter.instrument(client)
+                self._clients[key] = client
+            return client
+
+    def caller_identity(self):
+        with self._lock:
+            identity = self._caller_identity
+        if identity is None:
+            identity = self.client('sts').get_caller_identity()
+            with self._lock:
+                self._caller_identity = identity
+        return identity
+
+    def account_id(self):
+        return self.caller_identity()['Account']
+
+
+def as_client_factory(session):
+    return session if isinstance(session, ClientFactory) else ClientFactory(session)
@@ -0,0 +1,37 @@
+import posixpath
+from collections import Counter
+from urllib.parse import quote
+
+MAX_INVALIDATION_PATHS = 3000
+MAX_WILDCARD_PATHS = 15
+
+
+def parent_directories(path):
+    parts = path.strip('/').split('/')[:-1]
+    return ['/' + '/'.join(parts[:depth]) + '/' for depth in range(1, len(parts) + 1)]
+
+
+def collapse_invalidation_paths(keys, default_root_object='index.html', max_paths=MAX_INVALIDATION_PATHS, max_wildcards=MAX_WILDCARD_PATHS):
+    paths = set()
+    for key in keys:
+        key = key.replace('\\', '/').lstrip('/')
+        # CloudFront matches invalidation paths against the URL-encoded request path; a trailing '*' stays a wildcard
+        paths.add('/' + (quote(key[:-1], safe='/~') + '*' if key.endswith('*') else quote(key, safe='/~')))
+        if key == default_root_object:
+            paths.add('/')
+
+    wildcards = set()
+    while len(paths) + len(wildcards) > max_paths:
+        if len(wildcards) >= max_wildcards:
+            return ['/*']
+        counts = Counter(directory for path in paths for directory in parent_directories(path))
+        if not counts:
+            return ['/*']
+        directory, count = max(counts.items(), key=lambda item: (item[1], -len(item[0])))
+        if count <= 1:
+            return ['/*']
+        wildcards = {wildcard for wildcard in wildcards if not wildcard.startswith(directory)}
+        wildcards.add(posixpath.join(directory, '*'))
+        paths = {path for path in paths if not path.startswith(directory)}
+
+    return sorted(paths) + sorted(wildcards)
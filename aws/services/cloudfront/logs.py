@@ -0,0 +1,190 @@
+import gzip
+import io
+import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_FIELDS = [
+    'date', 'time', 'x-edge-location', 'sc-bytes', 'c-ip', 'cs-method', 'cs(Host)', 'cs-uri-stem', 'sc-status',
+    'cs(Referer)', 'cs(User-Agent)', 'cs-uri-query', 'cs(Cookie)', 'x-edge-result-type', 'x-edge-request-id',
+    'x-host-header', 'cs-protocol', 'cs-bytes', 'time-taken', 'x-forwarded-for', 'ssl-protocol', 'ssl-cipher',
+    'x-edge-response-result-type', 'cs-protocol-version', 'fle-status', 'fle-encrypted-fields', 'c-port',
+    'time-to-first-byte', 'x-edge-detailed-result-type', 'sc-content-type', 'sc-content-len', 'sc-range-start',
+    'sc-range-end'
+]
+COLUMNS = ('x-edge-location', 'sc-bytes', 'cs-uri-stem', 'x-edge-result-type', 'time-taken')
+HIT_RESULTS = frozenset(('Hit', 'RefreshHit', 'OriginShieldHit'))
+MISS_RESULTS = frozenset(('Miss',))
+
+
+class LatencyHistogram:
+    def __init__(self, precision=0.02):
+        self.base = math.log1p(precision)
+        self.bins = defaultdict(int)
+        self.count = 0
+
+    def add_many(self, values_ms):
+        base = self.base
+        bins = self.bins
+        for value in values_ms:
+            bins[int(math.log(value) / base) if value >= 1 else -1] += 1
+        self.count += len(values_ms)
+
+    def merge(self, other):
+        for index, count in other.bins.items():
+            self.bins[index] += count
+        self.count += other.count
+
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return 0.0 if index < 0 else math.exp((index + 0.5) * self.base)
+        return None
+
+
+class GroupStats:
+    def __init__(self):
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self.latency = LatencyHistogram()
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.hits += other.hits
+        self.misses += other.misses
+        self.bytes += other.bytes
+        self.latency.merge(other.latency)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'hit_ratio': self.hits / self.requests if self.requests else 0.0,
+            'miss_ratio': self.misses / self.requests if self.requests else 0.0,
+            'bytes': self.bytes,
+            'p50_ms': self.latency.percentile(0.5),
+            'p90_ms': self.latency.percentile(0.9),
+            'p99_ms': self.latency.percentile(0.99)
+        }
+
+
+def path_prefix(uri, depth):
+    directories = uri.lstrip('/').split('/')[:-1][:depth]
+    return '/' + ''.join(f'{directory}/' for directory in directories)
+
+
+class AccessLogAggregator:
+    def __init__(self, prefix_depth=1, chunk_size=50000):
+        self.prefix_depth = prefix_depth
+        self.chunk_size = chunk_size
+        self.by_prefix = defaultdict(GroupStats)
+        self.by_edge = defaultdict(GroupStats)
+        self.lines = 0
+        self.skipped = 0
+
+    def consume(self, lines):
+        fields = DEFAULT_FIELDS
+        positions = [fields.index(column) for column in COLUMNS]
+        chunk = []
+        for line in lines:
+            if line.startswith('#'):
+                if line.startswith('#Fields:'):
+                    self.flush(chunk, positions)
+                    chunk = []
+                    fields = line[len('#Fields:'):].split()
+                    positions = [fields.index(column) for column in COLUMNS]
+                continue
+            chunk.append(line.rstrip('\n').split('\t'))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk, positions)
+                chunk = []
+        self.flush(chunk, positions)
+        return self
+
+    def flush(self, rows, positions):
+        width = max(positions) + 1
+        parsed = [row for row in rows if len(row) >= width]
+        self.skipped += len(rows) - len(parsed)
+        rows = parsed
+        if not rows:
+            return
+        edges, sizes, uris, results, times = ([row[position] for row in rows] for position in positions)
+        sizes = [int(size) if size.isdigit() else 0 for size in sizes]
+        times = [float(taken) * 1000 for taken in times]
+        seen = {}
+        prefixes = [seen[uri] if uri in seen else seen.setdefault(uri, path_prefix(uri, self.prefix_depth)) for uri in uris]
+        self.lines += len(rows)
+
+        for groups, keys in ((self.by_prefix, prefixes), (self.by_edge, [edge[:3] for edge in edges])):
+            partitions = defaultdict(list)
+            for position, key in enumerate(keys):
+                partitions[key].append(position)
+            for key, members in partitions.items():
+                stats = groups[key]
+                stats.requests += len(members)
+                stats.hits += sum(1 for member in members if results[member] in HIT_RESULTS)
+                stats.misses += sum(1 for member in members if results[member] in MISS_RESULTS)
+                stats.bytes += sum(sizes[member] for member in members)
+                stats.latency.add_many([times[member] for member in members])
+
+    def merge(self, other):
+        for mine, theirs in ((self.by_prefix, other.by_prefix), (self.by_edge, other.by_edge)):
+            for key, stats in theirs.items():
+                mine[key].merge(stats)
+        self.lines += other.lines
+        self.skipped += other.skipped
+        return self
+
+    def report(self, by='prefix', limit=20):
+        groups = self.by_prefix if by == 'prefix' else self.by_edge
+        rows = sorted(groups.items(), key=lambda item: item[1].requests, reverse=True)[:limit]
+        return [dict(stats.as_dict(), **{by: key}) for key, stats in rows]
+
+    def print_report(self, limit=20):
+        total = GroupStats()
+        for stats in self.by_prefix.values():
+            total.merge(stats)
+        summary = total.as_dict()
+        print(f"{self.lines} requests, hit ratio {summary['hit_ratio']:.1%}, {summary['bytes'] / 1048576:.1f} MB served")
+        for by in ('prefix', 'edge'):
+            print(f"{by:<24} {'requests':>10} {'hit':>7} {'miss':>7} {'MB':>10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+            for row in self.report(by, limit):
+                print(f"{row[by][:24]:<24} {row['requests']:>10} {row['hit_ratio']:>7.1%} {row['miss_ratio']:>7.1%} "
+                      f"{row['bytes'] / 1048576:>10.2f} {row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+
+
+def read_log_lines(fileobj):
+    with gzip.GzipFile(fileobj=fileobj) as stream:
+        yield from io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+
+
+def analyze_files(paths, prefix_depth=1, chunk_size=50000):
+    aggregator = AccessLogAggregator(prefix_depth, chunk_size)
+    for path in paths:
+        with open(path, 'rb') as file:
+            aggregator.consume(read_log_lines(file))
+    return aggregator
+
+
+def analyze_bucket(s3_client, bucket_name, prefix='', prefix_depth=1, chunk_size=50000, max_workers=8):
+    def analyze(s3_key):
+        body = s3_client.get_object(Bucket=bucket_name, Key=s3_key)['Body']
+        try:
+            return AccessLogAggregator(prefix_depth, chunk_size).consume(read_log_lines(body))
+        finally:
+            body.close()
+
+    aggregator = AccessLogAggregator(prefix_depth, chunk_size)
+    paginator = s3_client.get_paginator('list_objects_v2')
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            keys = [obj['Key'] for obj in page.get('Contents', []) if obj['Key'].endswith('.gz')]
+            for partial in executor.map(analyze, keys):
+                aggregator.merge(partial)
+    return aggregator
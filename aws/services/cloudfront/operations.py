@@ -1,13 +1,56 @@
+import copy
+import hashlib
+import threading
+import time
 from botocore.exceptions import ClientError
+from services.clients import as_client_factory
+from services.cloudfront.invalidation import collapse_invalidation_paths
+from services.cloudfront.policies import cache_behavior, default_policies, default_routes, merge_behavior
+from services.cloudfront.tracker import DeploymentTracker
+
+FUNCTION_SIZE_LIMIT = 10 * 1024
+OAC_NAME = 'S3OriginAccessControl'
+POLICY_TYPES = {'cache': 'CachePolicy', 'origin_request': 'OriginRequestPolicy'}
 
 
 class CloudFrontOperations:
     def __init__(self, session):
-        self.cloudfront_client = session.client('cloudfront')
-        self.sts_client = session.client('sts')
+        self.clients = as_client_factory(session)
+        self.cloudfront_client = self.clients.client('cloudfront')
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    def _list_all(self, operation, list_key, **kwargs):
+        marker = None
+        while True:
+            params = dict(kwargs, Marker=marker) if marker else kwargs
+            page = getattr(self.cloudfront_client, operation)(**params)[list_key]
+            yield from page.get('Items') or []
+            marker = page.get('NextMarker')
+            if not marker:
+                return
+
+    def refresh_index(self):
+        index = {'distributions': {}, 'oacs': {}, 'functions': {}}
+        for distribution in self._list_all('list_distributions', 'DistributionList'):
+            for origin in distribution['Origins']['Items']:
+                index['distributions'].setdefault(origin['DomainName'], distribution)
+        for oac in self._list_all('list_origin_access_controls', 'OriginAccessControlList'):
+            index['oacs'].setdefault(oac['Name'], oac['Id'])
+        for function in self._list_all('list_functions', 'FunctionList'):
+            index['functions'][function['Name']] = function
+        self._index = index
+        return index
+
+    @property
+    def index(self):
+        with self._index_lock:
+            if self._index is None:
+                self.refresh_index()
+            return self._index
 
     def get_or_create_origin_access_control(self):
-        oac_name = 'S3OriginAccessControl'
+        oac_name = OAC_NAME
         oac_id = self.get_existing_oac(oac_name)
 
         if not oac_id:
@@ -16,11 +59,15 @@ class CloudFrontOperations:
         return oac_id
 
     def get_existing_oac(self, oac_name):
-        oac_list = self.cloudfront_client.list_origin_access_controls()
-        for oac in oac_list['OriginAccessControlList']['Items']:
-            if oac['Name'] == oac_name:
-                return oac['Id']
-        return None
+        return self.index['oacs'].get(oac_name)
+
+    def get_origin_access_control(self, oac_id):
+        try:
+            return self.cloudfront_client.get_origin_access_control(Id=oac_id)['OriginAccessControl']
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchOriginAccessControl':
+                return None
+            raise
 
     def create_origin_access_control(self, oac_name):
         response = self.cloudfront_client.create_origin_access_control(
@@ -32,14 +79,13 @@ class CloudFrontOperations:
                 'OriginAccessControlOriginType': 's3'
             }
         )
+        self.index['oacs'][oac_name] = response['OriginAccessControl']['Id']
         return response['OriginAccessControl']['Id']
 
     def get_existing_distribution(self, bucket_name, region):
-        distributions = self.cloudfront_client.list_distributions()
-        if distributions['DistributionList']['Quantity'] > 0:
-            for distribution in distributions['DistributionList']['Items']:
-                if distribution['Origins']['Items'][0]['DomainName'] == f"{bucket_name}.s3.{region}.amazonaws.com":
-                    return distribution['Id'], distribution['DomainName']
+        distribution = self.index['distributions'].get(f"{bucket_name}.s3.{region}.amazonaws.com")
+        if distribution:
+            return distribution['Id'], distribution['DomainName']
         return None, None
 
     def create_distribution(self, bucket_name, region, origin_access_control_id):
@@ -81,50 +127,156 @@ class CloudFrontOperations:
                         },
                         'MinTTL': 0,
                         'DefaultTTL': 86400,
-                        'MaxTTL': 31536000
+                        'MaxTTL': 31536000,
+                        'Compress': True
                     },
                     'Comment': 'CloudFront distribution for static website',
                     'Enabled': True
                 }
             )
-            return response['Distribution']['Id']
+            distribution = response['Distribution']
+            self.index['distributions'][f'{bucket_name}.s3.{region}.amazonaws.com'] = {
+                'Id': distribution['Id'],
+                'DomainName': distribution['DomainName']
+            }
+            return distribution['Id']
         except ClientError as e:
             print(f'Error creating CloudFront distribution: {e}')
             raise
 
-    def update_distribution_oac(self, distribution_id, origin_access_control_id):
-        response = self.cloudfront_client.get_distribution_config(Id=distribution_id)
-        distribution_config = response['DistributionConfig']
-        distribution_config['Origins']['Items'][0]['OriginAccessControlId'] = origin_access_control_id
-        etag = response['ETag']
-        self.cloudfront_client.update_distribution(DistributionConfig=distribution_config, Id=distribution_id, IfMatch=etag)
+    def get_distribution_config(self, distribution_id):
+        try:
+            response = self.cloudfront_client.get_distribution_config(Id=distribution_id)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchDistribution':
+                return None, None
+            raise
+        return response['DistributionConfig'], response['ETag']
 
-    def create_or_update_cloudfront_function(self, cloudfrontfunction_name, ec2_endpoint):
+    def apply_mutations(self, distribution_config, mutations):
+        distribution_config = copy.deepcopy(distribution_config)
+        for mutate in mutations:
+            mutate(distribution_config)
+        return distribution_config
+
+    def update_distribution_config(self, distribution_id, mutations, max_attempts=5):
+        for attempt in range(1, max_attempts + 1):
+            response = self.cloudfront_client.get_distribution_config(Id=distribution_id)
+            original_config = response['DistributionConfig']
+            distribution_config = self.apply_mutations(original_config, mutations)
+
+            if distribution_config == original_config:
+                print(f'Distribution {distribution_id} is already up to date.')
+                return False
+
+            try:
+                self.cloudfront_client.update_distribution(DistributionConfig=distribution_config, Id=distribution_id, IfMatch=response['ETag'])
+                return True
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'PreconditionFailed' or attempt == max_attempts:
+                    raise
+                print(f'Distribution {distribution_id} changed concurrently, re-applying changes (attempt {attempt + 1}).')
+
+    def origin_access_control_mutation(self, origin_access_control_id, domain_name=None):
+        def mutate(distribution_config):
+            for origin in distribution_config['Origins']['Items']:
+                if domain_name is None or origin['DomainName'] == domain_name:
+                    origin['OriginAccessControlId'] = origin_access_control_id
+                    if domain_name is None:
+                        break
+        return mutate
+
+    def origin_path_mutation(self, origin_path, domain_name, previous=None):
+        def mutate(distribution_config):
+            for origin in distribution_config['Origins']['Items']:
+                if origin['DomainName'] == domain_name:
+                    if previous is not None:
+                        previous.append(origin.get('OriginPath', ''))
+                    origin['OriginPath'] = origin_path
+        return mutate
+
+    def get_origin_path(self, distribution_id, domain_name):
+        distribution_config = self.cloudfront_client.get_distribution_config(Id=distribution_id)['DistributionConfig']
+        for origin in distribution_config['Origins']['Items']:
+            if origin['DomainName'] == domain_name:
+                return origin.get('OriginPath', '')
+        return None
+
+    def set_origin_path(self, distribution_id, bucket_name, region, origin_path):
+        previous = []
+        mutation = self.origin_path_mutation(origin_path, f'{bucket_name}.s3.{region}.amazonaws.com', previous)
+        if self.update_distribution_config(distribution_id, [mutation]):
+            print(f"Switched distribution '{distribution_id}' origin path from '{previous[-1]}' to '{origin_path}'.")
+        return previous[-1] if previous else None
+
+    def logging_mutation(self, log_bucket_name, prefix):
+        def mutate(distribution_config):
+            distribution_config['Logging'] = {
+                'Enabled': True,
+                'IncludeCookies': False,
+                'Bucket': f'{log_bucket_name}.s3.amazonaws.com',
+                'Prefix': prefix
+            }
+        return mutate
+
+    def get_function_code(self, function_name, stage):
+        try:
+            response = self.cloudfront_client.get_function(Name=function_name, Stage=stage)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchFunctionExists':
+                return None, None
+            raise
+        return response['FunctionCode'].read(), response['ETag']
+
+    def describe_function_etag(self, function_name, stage='LIVE'):
+        try:
+            return self.cloudfront_client.describe_function(Name=function_name, Stage=stage)['ETag']
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchFunctionExists':
+                return None
+            raise
+
+    def render_function_code(self, cloudfrontfunction_name, ec2_endpoint):
         function_template_path = f'resources/{cloudfrontfunction_name}.js'
 
         with open(function_template_path, 'r') as file:
             template_function = file.read()
 
-        function_code = template_function.replace('<EC2_ENDPOINT>', ec2_endpoint)
+        return template_function.replace('<EC2_ENDPOINT>', ec2_endpoint).encode('utf-8')
 
-        list_response = self.cloudfront_client.list_functions()
-        function_exists = any(func['Name'] == cloudfrontfunction_name for func in list_response['FunctionList']['Items'])
+    def create_or_update_cloudfront_function(self, cloudfrontfunction_name, ec2_endpoint):
+        code_bytes = self.render_function_code(cloudfrontfunction_name, ec2_endpoint)
+        code_digest = hashlib.sha256(code_bytes).hexdigest()
 
-        if function_exists:
-            print(f"Function '{cloudfrontfunction_name}' already exists. Updating...")
+        print(f"Function '{cloudfrontfunction_name}' is {len(code_bytes)} bytes "
+              f"({len(code_bytes) / FUNCTION_SIZE_LIMIT:.0%} of the {FUNCTION_SIZE_LIMIT} byte CloudFront Functions limit).")
+        if len(code_bytes) > FUNCTION_SIZE_LIMIT:
+            raise ValueError(f"Function '{cloudfrontfunction_name}' exceeds the CloudFront Functions size limit.")
 
-            existing_function = self.cloudfront_client.describe_function(Name=cloudfrontfunction_name)
+        function_exists = cloudfrontfunction_name in self.index['functions']
 
-            update_response = self.cloudfront_client.update_function(
-                Name=cloudfrontfunction_name,
-                IfMatch=existing_function['ETag'],
-                FunctionConfig={
-                    'Comment': f'Updated function for {cloudfrontfunction_name}',
-                    'Runtime': 'cloudfront-js-1.0'
-                },
-                FunctionCode=function_code
-            )
-            e_tag = update_response['ETag']
+        if function_exists:
+            live_code, live_etag = self.get_function_code(cloudfrontfunction_name, 'LIVE')
+            if live_code is not None and hashlib.sha256(live_code).hexdigest() == code_digest:
+                print(f"Function '{cloudfrontfunction_name}' is unchanged ({code_digest[:12]}). Skipping update and publish.")
+                return live_etag
+
+            development_code, development_etag = self.get_function_code(cloudfrontfunction_name, 'DEVELOPMENT')
+            if development_code is not None and hashlib.sha256(development_code).hexdigest() == code_digest:
+                print(f"Function '{cloudfrontfunction_name}' is already updated but not published.")
+                e_tag = development_etag
+            else:
+                print(f"Function '{cloudfrontfunction_name}' already exists. Updating...")
+                update_response = self.cloudfront_client.update_function(
+                    Name=cloudfrontfunction_name,
+                    IfMatch=development_etag,
+                    FunctionConfig={
+                        'Comment': f'Updated function for {cloudfrontfunction_name}',
+                        'Runtime': 'cloudfront-js-1.0'
+                    },
+                    FunctionCode=code_bytes
+                )
+                e_tag = update_response['ETag']
         else:
             print(f"Function '{cloudfrontfunction_name}' does not exist. Creating...")
             create_response = self.cloudfront_client.create_function(
@@ -133,9 +285,10 @@ class CloudFrontOperations:
                     'Comment': f'Function for {cloudfrontfunction_name}',
                     'Runtime': 'cloudfront-js-1.0'
                 },
-                FunctionCode=function_code
+                FunctionCode=code_bytes
             )
             e_tag = create_response['ETag']
+            self.index['functions'][cloudfrontfunction_name] = create_response['FunctionSummary']
 
         self.cloudfront_client.publish_function(
             Name=cloudfrontfunction_name,
@@ -145,89 +298,142 @@ class CloudFrontOperations:
 
         return e_tag
 
-    def associate_function_with_distribution(self, distribution_id, function_name):
-        response = self.cloudfront_client.get_distribution_config(Id=distribution_id)
-        cache_behaviour_configs = response['DistributionConfig']['CacheBehaviors']['Items']
-        if cache_behaviour_configs:
-            for config in cache_behaviour_configs:
-                if config['FunctionAssociations'] and config['FunctionAssociations']['Quantity'] > 0:
-                    for function in config['FunctionAssociations']['Items']:
-                        if function_name in function['FunctionARN']:
-                            return
-
-        distribution_config = response['DistributionConfig']
-        etag = response['ETag']
-        new_behavior = {
-            'PathPattern': '*',
-            'TargetOriginId': distribution_config['DefaultCacheBehavior']['TargetOriginId'],
-            'ViewerProtocolPolicy': 'redirect-to-https',
-            'AllowedMethods': {
-                'Quantity': 7,
-                'Items': ['HEAD', 'DELETE', 'POST', 'GET', 'OPTIONS', 'PUT', 'PATCH'],
-                'CachedMethods': {
-                    'Quantity': 2,
-                    'Items': ['HEAD', 'GET']
-                }
-            },
-            'MinTTL': 0,
-            'DefaultTTL': 0,
-            'MaxTTL': 0,
-            'Compress': False,
-            'SmoothStreaming': False,
-            'ForwardedValues': {
-                'QueryString': True,
-                'Cookies': {'Forward': 'all'},
-                'Headers': {
-                    'Quantity': 3,
-                    'Items': ['Sec-WebSocket-Key', 'Sec-WebSocket-Version', 'Sec-WebSocket-Protocol']
-                },
-                'QueryStringCacheKeys': {
-                    'Quantity': 0,
-                },
-            },
-            "LambdaFunctionAssociations": {
-                "Quantity": 0
-            },
-            'FieldLevelEncryptionId': "",
-            'FunctionAssociations': {
-                'Quantity': 1,
-                'Items': [
-                    {
-                        'FunctionARN': f"arn:aws:cloudfront::{self.sts_client.get_caller_identity()['Account']}:function/{function_name}",
-                        'EventType': 'viewer-request'
-                    }
-                ]
-            }
-        }
+    def find_policy(self, kind, name):
+        policy_type = POLICY_TYPES[kind]
+        snake = 'cache_policy' if kind == 'cache' else 'origin_request_policy'
+        for item in self._list_all(f'list_{snake.replace("policy", "policies")}', f'{policy_type}List', Type='custom'):
+            if item[policy_type][f'{policy_type}Config']['Name'] == name:
+                return item[policy_type]
+        return None
 
-        if 'CacheBehaviors' not in distribution_config:
-            distribution_config['CacheBehaviors'] = {'Quantity': 0, 'Items': []}
-        if 'Items' not in distribution_config['CacheBehaviors']:
-            distribution_config['CacheBehaviors']['Items'] = []
-        distribution_config['CacheBehaviors']['Items'].append(new_behavior)
-        distribution_config['CacheBehaviors']['Quantity'] += 1
-
-        response = self.cloudfront_client.update_distribution(
-            DistributionConfig=distribution_config,
-            Id=distribution_id,
-            IfMatch=etag
-        )
+    def get_policy_config(self, kind, policy_id):
+        policy_type = POLICY_TYPES[kind]
+        snake = 'cache_policy' if kind == 'cache' else 'origin_request_policy'
+        try:
+            return getattr(self.cloudfront_client, f'get_{snake}_config')(Id=policy_id)[f'{policy_type}Config']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchCachePolicy', 'NoSuchOriginRequestPolicy'):
+                return None
+            raise
 
-        print(f"CloudFront function '{function_name}' has been associated with distribution '{distribution_id}' for redirecting requests to EC2.")
+    def ensure_policy(self, kind, policy_config):
+        policy_type = POLICY_TYPES[kind]
+        snake = 'cache_policy' if kind == 'cache' else 'origin_request_policy'
+        existing = self.find_policy(kind, policy_config['Name'])
 
-    def setup_cloudfront(self, bucket_name, region, cloudfrontfunction_name, ec2_endpoint):
-        origin_access_control_id = self.get_or_create_origin_access_control()
+        if existing is None:
+            response = getattr(self.cloudfront_client, f'create_{snake}')(**{f'{policy_type}Config': policy_config})
+            print(f"Created {kind.replace('_', ' ')} policy '{policy_config['Name']}'.")
+            return response[policy_type]['Id']
+        if existing[f'{policy_type}Config'].get('Comment') != policy_config['Comment']:
+            etag = getattr(self.cloudfront_client, f'get_{snake}_config')(Id=existing['Id'])['ETag']
+            getattr(self.cloudfront_client, f'update_{snake}')(**{f'{policy_type}Config': policy_config, 'Id': existing['Id'], 'IfMatch': etag})
+            print(f"Updated {kind.replace('_', ' ')} policy '{policy_config['Name']}'.")
+        return existing['Id']
+
+    def ensure_policies(self, policies=None):
+        policies = policies or default_policies()
+        return {kind: {alias: self.ensure_policy(kind, policy_config) for alias, policy_config in configs.items()}
+                for kind, configs in policies.items()}
+
+    def cache_behaviors_mutation(self, function_name, policy_ids, routes=None, account_id=None):
+        routes = routes or default_routes()
+        function_arn = f"arn:aws:cloudfront::{account_id or self.clients.account_id()}:function/{function_name}"
 
+        def mutate(distribution_config):
+            default_behavior = distribution_config['DefaultCacheBehavior']
+            merge_behavior(default_behavior, {'CachePolicyId': policy_ids['cache']['static'], 'Compress': True})
+
+            def is_legacy(behavior):
+                associations = (behavior.get('FunctionAssociations') or {}).get('Items') or []
+                return behavior['PathPattern'] == '*' and any(function_name in association['FunctionARN'] for association in associations)
+
+            cache_behaviors = distribution_config.setdefault('CacheBehaviors', {'Quantity': 0})
+            items = [behavior for behavior in cache_behaviors.get('Items') or [] if not is_legacy(behavior)]
+            for route in routes:
+                desired = cache_behavior(route, default_behavior['TargetOriginId'], policy_ids, function_arn)
+                matches = [behavior for behavior in items if behavior['PathPattern'] == route['path_pattern']]
+                if matches:
+                    merge_behavior(matches[0], desired)
+                    items = [behavior for behavior in items if not any(behavior is duplicate for duplicate in matches[1:])]
+                else:
+                    items.append(desired)
+            cache_behaviors['Items'] = items
+            cache_behaviors['Quantity'] = len(items)
+        return mutate
+
+    def distribution_mutations(self, bucket_name, region, origin_access_control_id, function_name, policy_ids, account_id=None,
+                               log_bucket_name=None, log_prefix=''):
+        mutations = [
+            self.origin_access_control_mutation(origin_access_control_id, f'{bucket_name}.s3.{region}.amazonaws.com'),
+            self.cache_behaviors_mutation(function_name, policy_ids, account_id=account_id)
+        ]
+        if log_bucket_name:
+            mutations.append(self.logging_mutation(log_bucket_name, log_prefix))
+        return mutations
+
+    def configure_distribution(self, distribution_id, bucket_name, region, origin_access_control_id, function_name, policy_ids=None,
+                               log_bucket_name=None, log_prefix=''):
+        mutations = self.distribution_mutations(bucket_name, region, origin_access_control_id, function_name,
+                                                policy_ids or self.ensure_policies(), log_bucket_name=log_bucket_name, log_prefix=log_prefix)
+        if self.update_distribution_config(distribution_id, mutations):
+            print(f"Updated distribution '{distribution_id}' with Origin Access Control {origin_access_control_id} and function '{function_name}'.")
+
+    def ensure_distribution(self, bucket_name, region, origin_access_control_id):
         distribution_id, domain = self.get_existing_distribution(bucket_name, region)
         if not distribution_id:
             distribution_id = self.create_distribution(bucket_name, region, origin_access_control_id)
             print(f'CloudFront distribution created with ID: {distribution_id}')
         else:
             print(f'Existing CloudFront distribution found with ID: {distribution_id}, hosted at {domain}')
-            self.update_distribution_oac(distribution_id, origin_access_control_id)
-            print(f'Updated existing distribution with new Origin Access Control {origin_access_control_id}')
+        return distribution_id
+
+    def setup_cloudfront(self, bucket_name, region, cloudfrontfunction_name, ec2_endpoint):
+        origin_access_control_id = self.get_or_create_origin_access_control()
+        distribution_id = self.ensure_distribution(bucket_name, region, origin_access_control_id)
 
         self.create_or_update_cloudfront_function(cloudfrontfunction_name, ec2_endpoint)
-        self.associate_function_with_distribution(distribution_id, cloudfrontfunction_name)
+        self.configure_distribution(distribution_id, bucket_name, region, origin_access_control_id, cloudfrontfunction_name)
 
         return distribution_id
+
+    def invalidate(self, distribution_id, keys, wait=False, timeout=900):
+        paths = collapse_invalidation_paths(keys)
+        if not paths:
+            print('No changed objects to invalidate.')
+            return None
+
+        start = time.monotonic()
+        response = self.cloudfront_client.create_invalidation(
+            DistributionId=distribution_id,
+            InvalidationBatch={
+                'Paths': {
+                    'Quantity': len(paths),
+                    'Items': paths
+                },
+                'CallerReference': f'deploy-{time.time_ns()}'
+            }
+        )
+        invalidation = {
+            'Id': response['Invalidation']['Id'],
+            'Paths': paths,
+            'Status': response['Invalidation']['Status']
+        }
+        print(f"Created invalidation {invalidation['Id']} for {len(keys)} changed objects using {len(paths)} paths.")
+
+        if wait:
+            invalidation['Status'] = self.wait_for_invalidation(distribution_id, invalidation['Id'], timeout)
+            invalidation['Seconds'] = time.monotonic() - start
+        return invalidation
+
+    def wait_for_invalidation(self, distribution_id, invalidation_id, timeout=900):
+        results = self.wait_for_deployment(distribution_id, [invalidation_id], include_distribution=False, timeout=timeout)
+        return results[('invalidation', invalidation_id)]['Status']
+
+    def wait_for_deployment(self, distribution_id, invalidation_ids=(), include_distribution=True, timeout=1800, on_event=None):
+        tracker = DeploymentTracker(self.cloudfront_client, on_event=on_event)
+        if include_distribution:
+            tracker.track_distribution(distribution_id)
+        for invalidation_id in invalidation_ids:
+            tracker.track_invalidation(distribution_id, invalidation_id)
+        return tracker.wait(timeout)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+
+ALL_METHODS = ['HEAD', 'DELETE', 'POST', 'GET', 'OPTIONS', 'PUT', 'PATCH']
+CACHED_METHODS = ['HEAD', 'GET']
+WEBSOCKET_HEADERS = ['Sec-WebSocket-Key', 'Sec-WebSocket-Version', 'Sec-WebSocket-Protocol']
+LEGACY_BEHAVIOR_KEYS = ('ForwardedValues', 'MinTTL', 'DefaultTTL', 'MaxTTL')
+
+
+def _items(values):
+    values = sorted(values)
+    return {'Quantity': len(values), 'Items': values} if values else {'Quantity': 0}
+
+
+def _headers(behavior, headers):
+    config = {'HeaderBehavior': behavior}
+    if headers:
+        config['Headers'] = _items(headers)
+    return config
+
+
+def _cookies(behavior, cookies=()):
+    config = {'CookieBehavior': behavior}
+    if cookies:
+        config['Cookies'] = _items(cookies)
+    return config
+
+
+def _query_strings(behavior, query_strings=()):
+    config = {'QueryStringBehavior': behavior}
+    if query_strings:
+        config['QueryStrings'] = _items(query_strings)
+    return config
+
+
+def config_digest(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def with_digest(config, comment):
+    config = dict(config, Comment=comment)
+    config['Comment'] = f'{comment} [{config_digest(config)}]'
+    return config
+
+
+def cache_policy_config(name, min_ttl, default_ttl, max_ttl, comment, headers=(), cookies='none', query_strings='none'):
+    cacheable = max_ttl > 0
+    return with_digest({
+        'Name': name,
+        'MinTTL': min_ttl,
+        'DefaultTTL': default_ttl,
+        'MaxTTL': max_ttl,
+        'ParametersInCacheKeyAndForwardedToOrigin': {
+            'EnableAcceptEncodingGzip': cacheable,
+            'EnableAcceptEncodingBrotli': cacheable,
+            'HeadersConfig': _headers('whitelist' if headers else 'none', headers),
+            'CookiesConfig': _cookies(cookies),
+            'QueryStringsConfig': _query_strings(query_strings)
+        }
+    }, comment)
+
+
+def origin_request_policy_config(name, comment, headers=(), cookies='none', query_strings='none'):
+    return with_digest({
+        'Name': name,
+        'HeadersConfig': _headers('whitelist' if headers else 'none', headers),
+        'CookiesConfig': _cookies(cookies),
+        'QueryStringsConfig': _query_strings(query_strings)
+    }, comment)
+
+
+def default_policies(prefix='static-site'):
+    return {
+        'cache': {
+            'static': cache_policy_config(f'{prefix}-static', 0, 86400, 31536000,
+                                          'Static assets: honour object Cache-Control, gzip/brotli in the cache key'),
+            'no-cache': cache_policy_config(f'{prefix}-no-cache', 0, 0, 0, 'Dynamic routes: never cached at the edge')
+        },
+        'origin_request': {
+            'api': origin_request_policy_config(f'{prefix}-api', 'Forward cookies, query strings and WebSocket handshake headers',
+                                                headers=WEBSOCKET_HEADERS, cookies='all', query_strings='all')
+        }
+    }
+
+
+def default_routes(api_prefix='/api/*'):
+    return [
+        {
+            'path_pattern': api_prefix,
+            'cache_policy': 'no-cache',
+            'origin_request_policy': 'api',
+            'allowed_methods': ALL_METHODS,
+            'compress': False,
+            'function': True
+        }
+    ]
+
+
+def cache_behavior(route, target_origin_id, policy_ids, function_arn=None):
+    behavior = {
+        'PathPattern': route['path_pattern'],
+        'TargetOriginId': target_origin_id,
+        'ViewerProtocolPolicy': 'redirect-to-https',
+        'AllowedMethods': {
+            'Quantity': len(route['allowed_methods']),
+            'Items': list(route['allowed_methods']),
+            'CachedMethods': {'Quantity': len(CACHED_METHODS), 'Items': list(CACHED_METHODS)}
+        },
+        'CachePolicyId': policy_ids['cache'][route['cache_policy']],
+        'Compress': route['compress'],
+        'SmoothStreaming': False,
+        'LambdaFunctionAssociations': {'Quantity': 0},
+        'FieldLevelEncryptionId': '',
+        'FunctionAssociations': {'Quantity': 0}
+    }
+    if route.get('origin_request_policy'):
+        behavior['OriginRequestPolicyId'] = policy_ids['origin_request'][route['origin_request_policy']]
+    if route.get('function') and function_arn:
+        behavior['FunctionAssociations'] = {'Quantity': 1, 'Items': [{'FunctionARN': function_arn, 'EventType': 'viewer-request'}]}
+    return behavior
+
+
+def equivalent(current, desired):
+    if isinstance(current, dict) and isinstance(desired, dict):
+        return set(current) == set(desired) and all(equivalent(current[key], desired[key]) for key in desired)
+    if isinstance(current, list) and isinstance(desired, list):
+        return sorted(map(repr, current)) == sorted(map(repr, desired))
+    return current == desired
+
+
+def merge_behavior(behavior, fields):
+    for legacy_key in LEGACY_BEHAVIOR_KEYS:
+        behavior.pop(legacy_key, None)
+    for key, value in fields.items():
+        if not equivalent(behavior.get(key), value):
+            behavior[key] = value
+    return behavior
@@ -0,0 +1,83 @@
+import heapq
+import random
+import time
+
+
+class DeploymentTracker:
+    def __init__(self, cloudfront_client, initial_delay=2, max_delay=30, backoff=1.6, jitter=0.25, on_event=None):
+        self.cloudfront_client = cloudfront_client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.on_event = on_event or print_event
+        self.tracked = {}
+
+    def track_distribution(self, distribution_id):
+        key = ('distribution', distribution_id)
+        self.tracked[key] = {
+            'poll': lambda: self.cloudfront_client.get_distribution(Id=distribution_id)['Distribution']['Status'],
+            'done': 'Deployed'
+        }
+        return key
+
+    def track_invalidation(self, distribution_id, invalidation_id):
+        key = ('invalidation', invalidation_id)
+        self.tracked[key] = {
+            'poll': lambda: self.cloudfront_client.get_invalidation(DistributionId=distribution_id, Id=invalidation_id)['Invalidation']['Status'],
+            'done': 'Completed'
+        }
+        return key
+
+    def next_delay(self, delay, status_changed):
+        delay = self.initial_delay if status_changed else min(delay * self.backoff, self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter), delay
+
+    def wait(self, timeout=1800):
+        start = time.monotonic()
+        results = {}
+        queue = [(start, key) for key in self.tracked]
+        heapq.heapify(queue)
+        state = {key: {'delay': self.initial_delay, 'status': None, 'polls': 0} for key in self.tracked}
+
+        while queue:
+            due, key = heapq.heappop(queue)
+            now = time.monotonic()
+            if due > now:
+                if due - start > timeout:
+                    break
+                time.sleep(due - now)
+
+            tracked, entry = self.tracked[key], state[key]
+            status = tracked['poll']()
+            entry['polls'] += 1
+            elapsed = time.monotonic() - start
+            status_changed = status != entry['status']
+            entry['status'] = status
+
+            if status == tracked['done']:
+                results[key] = {'Status': status, 'Seconds': elapsed, 'Polls': entry['polls']}
+                self.on_event({'type': 'completed', 'resource': key, 'status': status, 'elapsed': elapsed, 'polls': entry['polls']})
+                continue
+
+            if status_changed:
+                self.on_event({'type': 'status', 'resource': key, 'status': status, 'elapsed': elapsed, 'polls': entry['polls']})
+            sleep, entry['delay'] = self.next_delay(entry['delay'], status_changed and entry['polls'] > 1)
+            heapq.heappush(queue, (time.monotonic() + sleep, key))
+
+        for key, entry in state.items():
+            if key not in results:
+                results[key] = {'Status': entry['status'], 'Seconds': None, 'Polls': entry['polls']}
+                self.on_event({'type': 'timeout', 'resource': key, 'status': entry['status'], 'elapsed': time.monotonic() - start,
+                               'polls': entry['polls']})
+        return results
+
+
+def print_event(event):
+    kind, resource_id = event['resource']
+    if event['type'] == 'completed':
+        print(f"{kind.capitalize()} {resource_id} is {event['status'].lower()} after {event['elapsed']:.1f}s ({event['polls']} polls).")
+    elif event['type'] == 'timeout':
+        print(f"Timed out waiting for {kind} {resource_id} (last status: {event['status']}).")
+    else:
+        print(f"{kind.capitalize()} {resource_id}: {event['status']} ({event['elapsed']:.1f}s)")
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from botocore.utils import determine_content_length
+
+THROTTLING_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException', 'TooManyRequestsException',
+    'RequestLimitExceeded', 'SlowDown', 'RequestThrottled', 'PriorRequestNotComplete', 'EC2ThrottledException'
+}
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def request_size(request):
+    size = request.headers.get('X-Amz-Decoded-Content-Length') or request.headers.get('Content-Length')
+    if size is None:
+        size = determine_content_length(request.body) if request.body is not None else 0
+    return int(size or 0)
+
+
+class Tracer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.operations = {}
+        self.stages = {}
+        self.trace_events = []
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def instrument(self, client):
+        service = client.meta.service_model.service_id.hyphenize()
+        events = client.meta.events
+        events.register(f'before-call.{service}', self._before_call)
+        events.register(f'after-call.{service}', self._after_call)
+        events.register(f'after-call-error.{service}', self._after_call_error)
+        events.register(f'before-send.{service}', self._before_send)
+        events.register(f'needs-retry.{service}', self._needs_retry)
+        return client
+
+    def _operation(self, name):
+        operation = self.operations.get(name)
+        if operation is None:
+            operation = self.operations[name] = {
+                'calls': 0, 'errors': 0, 'attempts': 0, 'retries': 0, 'throttles': 0,
+                'bytes_sent': 0, 'bytes_received': 0, 'latencies_ms': []
+            }
+        return name, operation
+
+    def _before_call(self, model, context, **kwargs):
+        with self.lock:
+            context['trace_operation'], _ = self._operation(f'{model.service_model.service_name}.{model.name}')
+        context['trace_start_us'] = self.now_us()
+
+    def _before_send(self, request, **kwargs):
+        name = request.context.get('trace_operation')
+        with self.lock:
+            if name in self.operations:
+                self.operations[name]['attempts'] += 1
+                self.operations[name]['bytes_sent'] += request_size(request)
+
+    def _needs_retry(self, response, **kwargs):
+        if not response:
+            return None
+        code = response[1].get('Error', {}).get('Code')
+        if code in THROTTLING_CODES:
+            name = kwargs['request_dict']['context'].get('trace_operation')
+            with self.lock:
+                if name in self.operations:
+                    self.operations[name]['throttles'] += 1
+        return None
+
+    def _finish(self, context, error, retries=0, bytes_received=0):
+        start_us = context.get('trace_start_us')
+        name = context.get('trace_operation')
+        if start_us is None or name is None:
+            return
+        end_us = self.now_us()
+        with self.lock:
+            _, operation = self._operation(name)
+            operation['calls'] += 1
+            operation['errors'] += int(bool(error))
+            operation['retries'] += retries
+            operation['bytes_received'] += bytes_received
+            operation['latencies_ms'].append((end_us - start_us) / 1000)
+            self.trace_events.append({
+                'name': name, 'cat': 'api', 'ph': 'X', 'ts': start_us, 'dur': end_us - start_us,
+                'pid': os.getpid(), 'tid': threading.get_ident(), 'args': {'error': error, 'retries': retries}
+            })
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        self._finish(context, 'Error' in parsed, retries, int(http_response.headers.get('content-length') or 0))
+
+    def _after_call_error(self, context, exception=None, **kwargs):
+        # botocore emits after-call-error with only context and exception, never the operation model
+        self._finish(context, type(exception).__name__ if exception is not None else True)
+
+    @contextmanager
+    def stage(self, name):
+        start_us = self.now_us()
+        try:
+            yield
+        finally:
+            end_us = self.now_us()
+            with self.lock:
+                self.stages[name] = (end_us - start_us) / 1e6
+                self.trace_events.append({
+                    'name': name, 'cat': 'stage', 'ph': 'X', 'ts': start_us, 'dur': end_us - start_us,
+                    'pid': os.getpid(), 'tid': threading.get_ident()
+                })
+
+    def summary(self):
+        with self.lock:
+            operations = {}
+            for name, operation in self.operations.items():
+                latencies = operation['latencies_ms']
+                histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+                for latency in latencies:
+                    histogram[next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if latency <= bound), len(HISTOGRAM_BUCKETS_MS))] += 1
+                operations[name] = {key: value for key, value in operation.items() if key != 'latencies_ms'}
+                operations[name].update({
+                    'total_ms': sum(latencies),
+                    'p50_ms': percentile(latencies, 0.5),
+                    'p90_ms': percentile(latencies, 0.9),
+                    'p99_ms': percentile(latencies, 0.99),
+                    'max_ms': max(latencies) if latencies else None,
+                    'histogram_ms': dict(zip([f'<={bound}' for bound in HISTOGRAM_BUCKETS_MS] + ['>30000'], histogram))
+                })
+            return {'stages': dict(self.stages), 'operations': operations}
+
+    def write(self, path):
+        with self.lock:
+            trace_events = list(self.trace_events)
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'otherData': self.summary()}, file, indent=1)
+        print(f'Wrote deploy trace to {path}')
+
+    def print_summary(self, limit=10):
+        operations = self.summary()['operations']
+        print(f"{'operation':<40} {'calls':>6} {'retries':>7} {'throttles':>9} {'p50 ms':>8} {'p99 ms':>8} {'total ms':>10}")
+        for name, operation in sorted(operations.items(), key=lambda item: -item[1]['total_ms'])[:limit]:
+            print(f"{name:<40} {operation['calls']:>6} {operation['retries']:>7} {operation['throttles']:>9} "
+                  f"{operation['p50_ms']:>8.1f} {operation['p99_ms']:>8.1f} {operation['total_ms']:>10.1f}")
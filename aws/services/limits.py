@@ -0,0 +1,135 @@
+import multiprocessing
+import threading
+import time
+from services.instrumentation import THROTTLING_CODES
+
+# requests per second: (initial, floor, ceiling)
+DEFAULT_RATES = {
+    's3': (1000.0, 50.0, 3500.0),
+    'cloudfront': (5.0, 0.5, 20.0),
+    'sts': (10.0, 1.0, 50.0),
+}
+
+
+def create_request_slots(limits):
+    return {service_name: multiprocessing.BoundedSemaphore(limit) for service_name, limit in limits.items()}
+
+
+class TokenBucket:
+    def __init__(self, rate, min_rate, max_rate, increase=1.0, decrease=0.5, cooldown=1.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.tokens = max(1.0, rate)
+        self.updated = time.monotonic()
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+        self.metrics = {'acquired': 0, 'waited_seconds': 0.0, 'successes': 0, 'throttles': 0, 'decreases': 0, 'peak_rate': rate}
+
+    def _refill(self, now):
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.metrics['acquired'] += 1
+            self.metrics['waited_seconds'] += wait
+        if wait:
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.metrics['successes'] += 1
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+            self.metrics['peak_rate'] = max(self.metrics['peak_rate'], self.rate)
+
+    def on_throttle(self):
+        with self.lock:
+            self.metrics['throttles'] += 1
+            now = time.monotonic()
+            if now - self.last_decrease < self.cooldown:
+                return
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+            self.last_decrease = now
+            self.metrics['decreases'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.metrics, rate=self.rate)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def service_bucket(service_name, rates=None):
+    with _buckets_lock:
+        bucket = _buckets.get(service_name)
+        if bucket is None:
+            initial, floor, ceiling = (rates or DEFAULT_RATES).get(service_name) or DEFAULT_RATES.get(service_name, (50.0, 1.0, 500.0))
+            bucket = _buckets[service_name] = TokenBucket(initial, floor, ceiling)
+        return bucket
+
+
+def limiter_metrics():
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {service_name: bucket.snapshot() for service_name, bucket in buckets.items()}
+
+
+def print_limiter_metrics():
+    for service_name, metrics in sorted(limiter_metrics().items()):
+        print(f"Rate limiter {service_name}: {metrics['acquired']} requests, rate {metrics['rate']:.1f}/s "
+              f"(peak {metrics['peak_rate']:.1f}/s), {metrics['throttles']} throttled, {metrics['decreases']} backoffs, "
+              f"{metrics['waited_seconds']:.2f}s waiting for tokens")
+
+
+def is_throttle(response):
+    if not response:
+        return False
+    http_response, parsed = response
+    return http_response.status_code == 429 or parsed.get('Error', {}).get('Code') in THROTTLING_CODES
+
+
+class RequestLimiter:
+    def __init__(self, request_slots=None, rates=None, shape=True):
+        self.request_slots = request_slots or {}
+        self.rates = rates
+        self.shape = shape
+
+    def instrument(self, client):
+        service_name = client.meta.service_model.service_name
+        # botocore emits events under the hyphenized service id, which differs from the endpoint prefix for e.g. resourcegroupstaggingapi
+        event_name = client.meta.service_model.service_id.hyphenize()
+        events = client.meta.events
+        if self.shape:
+            bucket = service_bucket(service_name, self.rates)
+            events.register(f'before-send.{event_name}', lambda **kwargs: bucket.acquire())
+            events.register(f'needs-retry.{event_name}', lambda **kwargs: self._feedback(bucket, **kwargs))
+        slots = self.request_slots.get(service_name)
+        if slots is not None:
+            events.register(f'before-send.{event_name}', lambda **kwargs: self._acquire(slots, **kwargs))
+            events.register(f'needs-retry.{event_name}', lambda **kwargs: self._release(slots, **kwargs))
+        return client
+
+    def _feedback(self, bucket, response, **kwargs):
+        if is_throttle(response):
+            bucket.on_throttle()
+        elif response is not None:
+            bucket.on_success()
+
+    def _acquire(self, slots, request, **kwargs):
+        slots.acquire()
+        request.context['request_slot'] = True
+
+    def _release(self, slots, request_dict, **kwargs):
+        if request_dict['context'].pop('request_slot', False):
+            slots.release()
@@ -0,0 +1,65 @@
+import posixpath
+import sys
+import tarfile
+import tempfile
+import zipfile
+from collections import namedtuple
+
+ArchiveMember = namedtuple('ArchiveMember', ['key', 'size', 'stream'])
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+SPOOL_LIMIT = 64 * 1024 * 1024
+
+
+def is_archive_source(source):
+    return source == '-' or source.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def member_key(name, strip_components=0):
+    parts = [part for part in posixpath.normpath(name.replace('\\', '/')).split('/') if part not in ('', '.')]
+    if '..' in parts or len(parts) <= strip_components:
+        return None
+    return '/'.join(parts[strip_components:])
+
+
+def _iter_tar(archive, strip_components):
+    for info in archive:
+        key = member_key(info.name, strip_components)
+        if not info.isfile() or key is None:
+            continue
+        stream = archive.extractfile(info)
+        try:
+            yield ArchiveMember(key, info.size, stream)
+        finally:
+            stream.close()
+
+
+def _iter_zip(archive, strip_components):
+    for info in archive.infolist():
+        key = member_key(info.filename, strip_components)
+        if info.is_dir() or key is None:
+            continue
+        with archive.open(info) as stream:
+            yield ArchiveMember(key, info.file_size, stream)
+
+
+def iter_archive(source, strip_components=0):
+    if source == '-':
+        stdin = sys.stdin.buffer
+        head = stdin.peek(4)[:4] if hasattr(stdin, 'peek') else b''
+        if head.startswith(b'PK'):
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_LIMIT) as spool:
+                for chunk in iter(lambda: stdin.read(1024 * 1024), b''):
+                    spool.write(chunk)
+                spool.seek(0)
+                with zipfile.ZipFile(spool) as archive:
+                    yield from _iter_zip(archive, strip_components)
+        else:
+            with tarfile.open(fileobj=stdin, mode='r|*') as archive:
+                yield from _iter_tar(archive, strip_components)
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            yield from _iter_zip(archive, strip_components)
+    else:
+        with tarfile.open(source, mode='r|*') as archive:
+            yield from _iter_tar(archive, strip_components)
@@ -0,0 +1,71 @@
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/javascript',
+    'application/json',
+    'application/manifest+json',
+    'application/xml',
+    'application/wasm',
+    'image/svg+xml',
+    'image/vnd.microsoft.icon',
+    'font/ttf',
+    'font/otf',
+}
+
+MIN_SIZE = 1024
+MIN_SAVING_RATIO = 0.1
+
+
+def is_compressible(content_type):
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+
+
+def compress_bytes(data, encodings=('gzip',)):
+    if len(data) < MIN_SIZE:
+        return None
+
+    variants = {}
+    if 'br' in encodings and brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    if 'gzip' in encodings:
+        variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+    if not variants:
+        return None
+
+    encoding, compressed = min(variants.items(), key=lambda item: len(item[1]))
+    if len(compressed) > len(data) * (1 - MIN_SAVING_RATIO):
+        return None
+    return encoding, compressed
+
+
+def compress_file(file_path, output_path, encodings=('gzip',)):
+    with open(file_path, 'rb') as file:
+        result = compress_bytes(file.read(), encodings)
+    if result is None:
+        return None
+
+    encoding, compressed = result
+    with open(output_path, 'wb') as file:
+        file.write(compressed)
+    return encoding, output_path
+
+
+def precompress(files, work_dir, encodings=('gzip',), max_workers=None):
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            s3_key: executor.submit(compress_file, file_path, os.path.join(work_dir, str(index)), encodings)
+            for index, (file_path, s3_key) in enumerate(files)
+        }
+        for s3_key, future in futures.items():
+            result = future.result()
+            if result is not None:
+                results[s3_key] = result
+    return results
@@ -0,0 +1,51 @@
+import json
+import time
+from botocore.exceptions import ClientError
+
+# deploy manifests live in the bucket under this prefix; sync and GC never treat them as site content
+HISTORY_PREFIX = '.deploys'
+
+
+class DeploymentHistory:
+    def __init__(self, s3_client, bucket_name, prefix=HISTORY_PREFIX):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip('/')
+
+    def manifest_key(self, deploy_id):
+        return f'{self.prefix}/{deploy_id}.json'
+
+    def record(self, keys):
+        s3_key = self.manifest_key(time.time_ns())
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=s3_key, Body=json.dumps({'deployed_at': time.time(), 'keys': sorted(keys)}).encode(),
+                                  ContentType='application/json', CacheControl='no-store')
+        return s3_key
+
+    def manifests(self):
+        deploy_ids = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f'{self.prefix}/', Delimiter='/'):
+            for obj in page.get('Contents', []):
+                deploy_id = obj['Key'][len(self.prefix) + 1:-len('.json')]
+                if obj['Key'].endswith('.json') and deploy_id.isdigit():
+                    deploy_ids.append(int(deploy_id))
+        return [self.manifest_key(deploy_id) for deploy_id in sorted(deploy_ids)]
+
+    def referenced_keys(self, keep):
+        manifests = self.manifests()[-keep:]
+        keys = set()
+        for s3_key in manifests:
+            try:
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            except ClientError as e:
+                if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                    continue
+                raise
+            keys.update(json.loads(response['Body'].read())['keys'])
+        return keys, len(manifests)
+
+    def prune(self, keep):
+        stale = self.manifests()[:-keep]
+        for i in range(0, len(stale), 1000):
+            self.s3_client.delete_objects(Bucket=self.bucket_name,
+                                          Delete={'Objects': [{'Key': s3_key} for s3_key in stale[i:i + 1000]], 'Quiet': True})
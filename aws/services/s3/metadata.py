@@ -0,0 +1,99 @@
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from fnmatch import fnmatch
+
+WEB_MIME_TYPES = {
+    ".html": "text/html",
+    ".htm": "text/html",
+    ".css": "text/css",
+    ".js": "application/javascript",
+    ".mjs": "application/javascript",
+    ".cjs": "application/javascript",
+    ".json": "application/json",
+    ".map": "application/json",
+    ".webmanifest": "application/manifest+json",
+    ".xml": "application/xml",
+    ".txt": "text/plain",
+    ".csv": "text/csv",
+    ".md": "text/markdown",
+    ".wasm": "application/wasm",
+    ".ico": "image/vnd.microsoft.icon",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".bmp": "image/bmp",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".eot": "application/vnd.ms-fontobject",
+    ".mp3": "audio/mpeg",
+    ".ogg": "audio/ogg",
+    ".wav": "audio/wav",
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".pdf": "application/pdf",
+    ".zip": "application/zip",
+}
+
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+FINGERPRINT_PATTERN = re.compile(r'[-.](?=[A-Za-z0-9_]*[0-9])[A-Za-z0-9_]{8,64}\.[A-Za-z0-9]+$')
+
+NO_CACHE = 'public, max-age=0, must-revalidate'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT_CACHE = 'public, max-age=3600'
+
+
+def is_fingerprinted(s3_key):
+    return FINGERPRINT_PATTERN.search(os.path.basename(s3_key)) is not None
+
+
+DEFAULT_RULES = [
+    ('*.html', {'CacheControl': NO_CACHE}),
+    ('*.webmanifest', {'CacheControl': NO_CACHE}),
+    (is_fingerprinted, {'CacheControl': IMMUTABLE}),
+    ('*', {'CacheControl': SHORT_CACHE}),
+]
+
+
+class MetadataRules:
+    def __init__(self, rules=None, mime_types=None):
+        self.mime_types = dict(mimetypes.MimeTypes().types_map[True])
+        self.mime_types.update(WEB_MIME_TYPES)
+        self.mime_types.update(mime_types or {})
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+
+    def add_mime_type(self, ext, content_type):
+        self.mime_types[ext.lower()] = content_type
+
+    def add_rule(self, matcher, metadata, first=True):
+        if first:
+            self.rules.insert(0, (matcher, metadata))
+        else:
+            self.rules.append((matcher, metadata))
+
+    def digest(self):
+        rules = [[matcher if isinstance(matcher, str) else f'{matcher.__module__}.{matcher.__qualname__}', metadata]
+                 for matcher, metadata in self.rules]
+        return hashlib.sha256(json.dumps([rules, self.mime_types], sort_keys=True).encode()).hexdigest()
+
+    def content_type(self, s3_key):
+        _, ext = os.path.splitext(s3_key)
+        return self.mime_types.get(ext.lower(), DEFAULT_CONTENT_TYPE)
+
+    def extra_args(self, s3_key):
+        extra_args = {'ContentType': self.content_type(s3_key)}
+        for matcher, metadata in self.rules:
+            matched = fnmatch(s3_key, matcher) if isinstance(matcher, str) else matcher(s3_key)
+            if matched:
+                extra_args.update(metadata)
+                break
+        return extra_args
@@ -1,13 +1,53 @@
+import hashlib
 import json
 import os
-from botocore.exceptions import ClientError
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from tqdm import tqdm
+from services.clients import as_client_factory
+from services.s3.gc import HISTORY_PREFIX, DeploymentHistory
+from services.s3.archive import iter_archive
+from services.s3.compression import compress_bytes, is_compressible, precompress
+from services.s3.metadata import MetadataRules
+from services.s3.scanner import fingerprint_tree, scan_tree
+from services.s3.transfer import MemoryBudget, open_stream
+
+# the transfer manager wraps S3 failures in S3UploadFailedError; connection failures surface as BotoCoreError
+UPLOAD_ERRORS = (ClientError, BotoCoreError, S3UploadFailedError, OSError)
+# md5 of the file as it is on disk; the ETag of a pre-compressed or multipart object is not
+SOURCE_MD5_METADATA = 'source-md5'
 
 
 class S3Operations:
-    def __init__(self, session, region=None):
-        self.s3_client = session.client('s3', region_name=region)
+    def __init__(self, session, region=None, max_workers=16, upload_mode='file', compress=False, compress_encodings=('gzip',),
+                 metadata_rules=None, journal=None):
+        self.clients = as_client_factory(session)
+        self.s3_client = self.clients.client('s3', region_name=region, config=Config(
+            max_pool_connections=max(max_workers, self.clients.max_pool_connections)
+        ))
         self.region = region
+        self.max_workers = max_workers
+        self.upload_mode = upload_mode
+        self.compress = compress
+        self.compress_encodings = compress_encodings
+        self.metadata_rules = metadata_rules or MetadataRules()
+        self.journal = journal
+        self.configure_transfer()
+
+    def configure_transfer(self, multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024,
+                           max_concurrency=10, use_threads=True, max_buffer_bytes=256 * 1024 * 1024):
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=use_threads
+        )
+        self.memory_budget = MemoryBudget(max_buffer_bytes)
 
     def create_bucket(self, bucket_name):
         try:
@@ -37,37 +77,421 @@ class S3Operations:
         # )
         # print("Disabled block public access")
 
-    def upload_files(self, bucket_name, folder_path):
-        mime_types = {
-            ".html": "text/html",
-            ".css": "text/css",
-            ".js": "application/javascript",
-            ".ico": "image/vnd.microsoft.icon",
-            ".jpeg": "image/jpeg",
-            ".png": "image/png",
-            ".svg": "image/svg+xml"
-        }
+    def create_log_bucket(self, bucket_name, expiration_days=30):
+        self.create_bucket(bucket_name)
+        self.s3_client.put_bucket_ownership_controls(
+            Bucket=bucket_name,
+            OwnershipControls={'Rules': [{'ObjectOwnership': 'BucketOwnerPreferred'}]}
+        )
+        self.s3_client.put_bucket_lifecycle_configuration(
+            Bucket=bucket_name,
+            LifecycleConfiguration={'Rules': [{
+                'ID': 'expire-access-logs',
+                'Filter': {'Prefix': ''},
+                'Status': 'Enabled',
+                'Expiration': {'Days': expiration_days}
+            }]}
+        )
+        print(f'Log bucket {bucket_name} is ready; logs expire after {expiration_days} days.')
 
-        all_files = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                all_files.append(os.path.join(root, file))
+    def upload_files(self, bucket_name, folder_path, max_workers=None):
+        all_files = [(entry.path, entry.key) for entry in scan_tree(folder_path)]
+        summary = self.upload_objects(bucket_name, all_files, max_workers)
+        summary['keys'] = sorted(s3_key for _, s3_key in all_files)
+        return summary
 
-        with tqdm(total=len(all_files), unit='file') as pbar:
-            for file_path in all_files:
-                s3_key = os.path.relpath(file_path, folder_path)
-                _, ext = os.path.splitext(file_path)
-                content_type = mime_types.get(ext.lower(), "application/octet-stream")
-                try:
-                    pbar.set_description(f'Uploading {s3_key}')
-                    self.s3_client.upload_file(file_path, bucket_name, s3_key, ExtraArgs={'ContentType': content_type})
+    def upload_objects(self, bucket_name, objects, max_workers=None, digests=None):
+        extra_args = {s3_key: self.metadata_rules.extra_args(s3_key) for _, s3_key in objects}
+
+        summary = {'files': 0, 'bytes': 0, 'errors': {}, 'uploaded': []}
+        source_md5s = digests or {}
+        if self.journal:
+            digests = digests or {s3_key: stat_fingerprint(file_path) for file_path, s3_key in objects}
+            summary['uploaded'] = [s3_key for _, s3_key in objects if self.journal.object_done(s3_key, digests[s3_key])]
+            if summary['uploaded']:
+                print(f"Skipping {len(summary['uploaded'])} files already uploaded by the interrupted deploy.")
+            objects = [(file_path, s3_key) for file_path, s3_key in objects if not self.journal.object_done(s3_key, digests[s3_key])]
+            self.abort_orphaned_multipart_uploads(bucket_name)
+        digests = digests or {}
+        start = time.monotonic()
+        with tempfile.TemporaryDirectory() as work_dir:
+            compressed = {}
+            if self.compress:
+                compressible = [(file_path, s3_key) for file_path, s3_key in objects if is_compressible(extra_args[s3_key]['ContentType'])]
+                compressed = precompress(compressible, work_dir, self.compress_encodings)
+                print(f'Pre-compressed {len(compressed)} of {len(compressible)} compressible files.')
+
+            def upload(file_path, s3_key):
+                object_args = dict(extra_args[s3_key])
+                if s3_key in compressed:
+                    encoding, file_path = compressed[s3_key]
+                    object_args['ContentEncoding'] = encoding
+                if s3_key in source_md5s:
+                    object_args['Metadata'] = dict(object_args.get('Metadata', {}), **{SOURCE_MD5_METADATA: source_md5s[s3_key]})
+                size = self.upload_object(bucket_name, file_path, s3_key, object_args, digests.get(s3_key))
+                if self.journal:
+                    self.journal.record_object(s3_key, digests[s3_key])
+                return size
+
+            with tqdm(total=len(objects), unit='file') as pbar, ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+                futures = {executor.submit(upload, file_path, s3_key): (file_path, s3_key) for file_path, s3_key in objects}
+                for future in as_completed(futures):
+                    file_path, s3_key = futures[future]
+                    try:
+                        summary['bytes'] += future.result()
+                        summary['files'] += 1
+                        summary['uploaded'].append(s3_key)
+                        pbar.set_description(f'Uploaded {s3_key}')
+                    except UPLOAD_ERRORS as e:
+                        print(f'\nError uploading {file_path}: {e}')
+                        summary['errors'][s3_key] = str(e)
                     pbar.update(1)
-                except ClientError as e:
-                    print(f'\nError uploading {file_path}: {e}')
+
+        summary['seconds'] = time.monotonic() - start
+        summary['files_per_second'] = summary['files'] / summary['seconds'] if summary['seconds'] else 0.0
+        summary['bytes_per_second'] = summary['bytes'] / summary['seconds'] if summary['seconds'] else 0.0
+        print(f"Uploaded {summary['files']} files ({summary['bytes']} bytes) in {summary['seconds']:.2f}s: "
+              f"{summary['files_per_second']:.1f} files/s, {summary['bytes_per_second'] / 1048576:.2f} MB/s")
+        if summary['errors']:
+            print(f"{len(summary['errors'])} files failed to upload.")
+        return summary
+
+    def upload_archive(self, bucket_name, source, max_workers=None, strip_components=0, remote_etags=None):
+        config = self.transfer_config
+        summary = {'files': 0, 'bytes': 0, 'errors': {}, 'uploaded': [], 'keys': [], 'added': [], 'modified': [], 'unchanged': 0}
+        pending = {}
+        multipart = []
+
+        def put(s3_key, body, object_args, reserved):
+            try:
+                self.s3_client.put_object(Bucket=bucket_name, Key=s3_key, Body=body, **object_args)
+                return len(body)
+            finally:
+                self.memory_budget.release(reserved)
+
+        def put_part(s3_key, upload_id, part_number, body, reserved):
+            try:
+                response = self.s3_client.upload_part(Bucket=bucket_name, Key=s3_key, UploadId=upload_id, PartNumber=part_number, Body=body)
+                return response['ETag']
+            finally:
+                self.memory_budget.release(reserved)
+
+        start = time.monotonic()
+        with tqdm(unit='file') as pbar, ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            for member in iter_archive(source, strip_components):
+                s3_key = member.key
+                summary['keys'].append(s3_key)
+                object_args = self.metadata_rules.extra_args(s3_key)
+                remote_etag = remote_etags.get(s3_key) if remote_etags is not None else None
+
+                if member.size < config.multipart_threshold:
+                    reserved = self.memory_budget.acquire(max(member.size, 1))
+                    body = member.stream.read()
+                    if self.compress and is_compressible(object_args['ContentType']):
+                        compressed = compress_bytes(body, self.compress_encodings)
+                        if compressed is not None:
+                            object_args['ContentEncoding'], body = compressed
+                    if remote_etag is not None and remote_etag == hashlib.md5(body).hexdigest():
+                        summary['unchanged'] += 1
+                        self.memory_budget.release(reserved)
+                        continue
+                    future = executor.submit(put, s3_key, body, object_args, reserved)
+                    pending[future] = s3_key
+                    future.add_done_callback(lambda _: pbar.update(1))
+                else:
+                    upload_id = self.s3_client.create_multipart_upload(Bucket=bucket_name, Key=s3_key, **object_args)['UploadId']
+                    parts = []
+                    for part_number in range(1, member.size // config.multipart_chunksize + 2):
+                        reserved = self.memory_budget.acquire(config.multipart_chunksize)
+                        chunk = member.stream.read(config.multipart_chunksize)
+                        if not chunk:
+                            self.memory_budget.release(reserved)
+                            break
+                        parts.append(executor.submit(put_part, s3_key, upload_id, part_number, chunk, reserved))
+                    multipart.append((s3_key, upload_id, parts, member.size))
+                if remote_etags is not None:
+                    (summary['modified'] if s3_key in remote_etags else summary['added']).append(s3_key)
+
+            for future in as_completed(pending):
+                s3_key = pending[future]
+                try:
+                    summary['bytes'] += future.result()
+                    summary['files'] += 1
+                    summary['uploaded'].append(s3_key)
+                except UPLOAD_ERRORS as e:
+                    print(f'\nError uploading {s3_key}: {e}')
+                    summary['errors'][s3_key] = str(e)
+
+            for s3_key, upload_id, parts, size in multipart:
+                try:
+                    etags = [part.result() for part in parts]
+                    self.s3_client.complete_multipart_upload(
+                        Bucket=bucket_name,
+                        Key=s3_key,
+                        UploadId=upload_id,
+                        MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etag} for number, etag in enumerate(etags, start=1)]}
+                    )
+                    summary['bytes'] += size
+                    summary['files'] += 1
+                    summary['uploaded'].append(s3_key)
+                except UPLOAD_ERRORS as e:
+                    print(f'\nError uploading {s3_key}: {e}')
+                    summary['errors'][s3_key] = str(e)
+                    self.s3_client.abort_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id)
+                pbar.update(1)
+
+        summary['added'] = [s3_key for s3_key in summary['added'] if s3_key not in summary['errors']]
+        summary['modified'] = [s3_key for s3_key in summary['modified'] if s3_key not in summary['errors']]
+        summary['seconds'] = time.monotonic() - start
+        summary['files_per_second'] = summary['files'] / summary['seconds'] if summary['seconds'] else 0.0
+        summary['bytes_per_second'] = summary['bytes'] / summary['seconds'] if summary['seconds'] else 0.0
+        print(f"Uploaded {summary['files']} archive members ({summary['bytes']} bytes) from {source} in {summary['seconds']:.2f}s, "
+              f"{summary['unchanged']} unchanged; peak buffered {self.memory_budget.peak / 1048576:.1f} MB")
+        if summary['errors']:
+            print(f"{len(summary['errors'])} files failed to upload.")
+        return summary
+
+    def upload_object(self, bucket_name, file_path, s3_key, extra_args, digest=None):
+        size = os.path.getsize(file_path)
+        if self.journal and digest and size >= self.transfer_config.multipart_threshold:
+            self.resumable_multipart_upload(bucket_name, file_path, s3_key, extra_args, digest, size)
+        elif self.upload_mode == 'stream':
+            config = self.transfer_config
+            buffered = size if size < config.multipart_threshold else config.multipart_chunksize * config.max_concurrency
+            with self.memory_budget.reserve(buffered), open_stream(file_path) as stream:
+                self.s3_client.upload_fileobj(stream, bucket_name, s3_key, ExtraArgs=extra_args, Config=config)
+        else:
+            self.s3_client.upload_file(file_path, bucket_name, s3_key, ExtraArgs=extra_args, Config=self.transfer_config)
+        return size
+
+    def resumable_multipart_upload(self, bucket_name, file_path, s3_key, extra_args, digest, size):
+        chunk_size = self.transfer_config.multipart_chunksize
+        upload_id, parts = self.journal.pending_multipart(s3_key, digest)
+        if upload_id:
+            try:
+                paginator = self.s3_client.get_paginator('list_parts')
+                parts = {}
+                for page in paginator.paginate(Bucket=bucket_name, Key=s3_key, UploadId=upload_id):
+                    for part in page.get('Parts', []):
+                        parts[part['PartNumber']] = part['ETag']
+                print(f'Resuming multipart upload of {s3_key}: {len(parts)} parts already uploaded.')
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'NoSuchUpload':
                     raise
+                self.journal.record_multipart_done(upload_id)
+                upload_id = None
+        if not upload_id:
+            upload_id = self.s3_client.create_multipart_upload(Bucket=bucket_name, Key=s3_key, **extra_args)['UploadId']
+            self.journal.record_multipart(s3_key, digest, upload_id)
+            parts = {}
 
-    def update_bucket_policy(self, bucket_name, cloudfront_distribution_id, account_id):
-        new_policy = {
+        def upload_part(part_number, offset):
+            with self.memory_budget.reserve(chunk_size), open(file_path, 'rb') as file:
+                file.seek(offset)
+                body = file.read(chunk_size)
+                response = self.s3_client.upload_part(Bucket=bucket_name, Key=s3_key, UploadId=upload_id, PartNumber=part_number, Body=body)
+            self.journal.record_part(upload_id, part_number, response['ETag'])
+            return part_number, response['ETag']
+
+        missing = [(part_number, offset) for part_number, offset in enumerate(range(0, size, chunk_size), start=1) if part_number not in parts]
+        if missing:
+            concurrency = self.transfer_config.max_concurrency if self.transfer_config.use_threads else 1
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(missing))) as executor:
+                for part_number, etag in executor.map(lambda part: upload_part(*part), missing):
+                    parts[part_number] = etag
+
+        self.s3_client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': parts[number]} for number in sorted(parts)]}
+        )
+        self.journal.record_multipart_done(upload_id)
+
+    def abort_orphaned_multipart_uploads(self, bucket_name):
+        tracked = self.journal.tracked_upload_ids() if self.journal else set()
+        started = self.journal.started if self.journal else time.time()
+        paginator = self.s3_client.get_paginator('list_multipart_uploads')
+        aborted = 0
+        for page in paginator.paginate(Bucket=bucket_name):
+            for upload in page.get('Uploads', []):
+                if upload['UploadId'] in tracked or upload['Initiated'].timestamp() >= started:
+                    continue
+                self.s3_client.abort_multipart_upload(Bucket=bucket_name, Key=upload['Key'], UploadId=upload['UploadId'])
+                aborted += 1
+        if aborted:
+            print(f'Aborted {aborted} orphaned multipart uploads in {bucket_name}.')
+        return aborted
+
+    def list_objects(self, bucket_name, prefix=''):
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        objects = {}
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                objects[obj['Key']] = {'ETag': obj['ETag'].strip('"'), 'Size': obj['Size']}
+        return objects
+
+    def plan_sync(self, bucket_name, folder_path, manifest_path=None, digest_cache_path=None):
+        manifest = {}
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as file:
+                manifest = json.load(file)
+
+        local_files = fingerprint_tree(folder_path, digest_cache_path)
+        remote_objects = self.list_objects(bucket_name)
+        plan = {'local_files': local_files, 'remote_objects': remote_objects, 'added': [], 'modified': [], 'pending': []}
+        unresolved = []
+        for s3_key, (entry, digest) in local_files.items():
+            remote = remote_objects.get(s3_key)
+            if remote is None:
+                plan['added'].append(s3_key)
+                plan['pending'].append((entry.path, s3_key))
+            elif remote['ETag'] == digest:
+                continue
+            elif manifest.get(s3_key, {}).get('md5') == digest and manifest[s3_key].get('etag') == remote['ETag']:
+                continue
+            else:
+                unresolved.append(s3_key)
+
+        remote_md5s = self.source_md5s(bucket_name, unresolved)
+        for s3_key in unresolved:
+            entry, digest = local_files[s3_key]
+            if remote_md5s.get(s3_key) != digest:
+                plan['modified'].append(s3_key)
+                plan['pending'].append((entry.path, s3_key))
+        plan['orphans'] = [s3_key for s3_key in remote_objects if s3_key not in local_files and not s3_key.startswith(f'{HISTORY_PREFIX}/')]
+        return plan
+
+    def source_md5s(self, bucket_name, keys, max_workers=None):
+        def head(s3_key):
+            try:
+                return self.s3_client.head_object(Bucket=bucket_name, Key=s3_key)['Metadata'].get(SOURCE_MD5_METADATA)
+            except ClientError as e:
+                if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                    return None
+                raise
+
+        if not keys:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            return dict(zip(keys, executor.map(head, keys)))
+
+    def sync_files(self, bucket_name, folder_path, delete=False, manifest_path=None, max_workers=None, digest_cache_path=None):
+        plan = self.plan_sync(bucket_name, folder_path, manifest_path, digest_cache_path)
+        local_files, remote_objects = plan['local_files'], plan['remote_objects']
+        added, modified, pending = plan['added'], plan['modified'], plan['pending']
+        local_digests = {s3_key: digest for s3_key, (_, digest) in local_files.items()}
+
+        print(f'Sync: {len(added)} new, {len(modified)} changed, {len(local_files) - len(pending)} unchanged files.')
+        if pending:
+            summary = self.upload_objects(bucket_name, pending, max_workers, local_digests)
+        else:
+            summary = {'files': 0, 'bytes': 0, 'errors': {}, 'uploaded': []}
+
+        deleted = []
+        if delete:
+            deleted = self.delete_objects(bucket_name, plan['orphans'])
+
+        if pending:
+            remote_objects = self.list_objects(bucket_name)
+        if manifest_path:
+            new_manifest = {}
+            for s3_key, digest in local_digests.items():
+                if s3_key in summary['errors'] or s3_key not in remote_objects:
+                    continue
+                new_manifest[s3_key] = {'md5': digest, 'etag': remote_objects[s3_key]['ETag']}
+            os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+            with open(manifest_path, 'w') as file:
+                json.dump(new_manifest, file, indent=2, sort_keys=True)
+
+        summary['keys'] = sorted(local_files)
+        summary['added'] = [s3_key for s3_key in added if s3_key not in summary['errors']]
+        summary['modified'] = [s3_key for s3_key in modified if s3_key not in summary['errors']]
+        summary['deleted'] = deleted
+        return summary
+
+    def _delete_batch(self, bucket_name, batch):
+        response = self.s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': s3_key} for s3_key in batch], 'Quiet': True}
+        )
+        failed = {error['Key'] for error in response.get('Errors', [])}
+        for error in response.get('Errors', []):
+            print(f"Error deleting {error['Key']}: {error['Message']}")
+        return [s3_key for s3_key in batch if s3_key not in failed]
+
+    def delete_objects(self, bucket_name, keys):
+        deleted = []
+        for i in range(0, len(keys), 1000):
+            deleted.extend(self._delete_batch(bucket_name, keys[i:i + 1000]))
+        if deleted:
+            print(f'Deleted {len(deleted)} orphaned objects from {bucket_name}.')
+        return deleted
+
+    def collect_garbage(self, bucket_name, keep=3, grace_period=7 * 24 * 3600, dry_run=True, exclude_prefixes=(), max_workers=None):
+        history = DeploymentHistory(self.s3_client, bucket_name)
+        referenced, manifests = history.referenced_keys(keep)
+        if not manifests:
+            print(f'No deployment manifests under s3://{bucket_name}/{history.prefix}/; skipping garbage collection.')
+            return None
+        exclude_prefixes = tuple(exclude_prefixes) + (f'{history.prefix}/',)
+
+        cutoff = time.time() - grace_period
+        report = {'scanned': 0, 'candidates': 0, 'bytes': 0, 'deleted': 0, 'sample': []}
+        batch, futures = [], []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            for page in paginator.paginate(Bucket=bucket_name):
+                for obj in page.get('Contents', []):
+                    report['scanned'] += 1
+                    s3_key = obj['Key']
+                    if s3_key in referenced or s3_key.startswith(exclude_prefixes) or obj['LastModified'].timestamp() > cutoff:
+                        continue
+                    report['candidates'] += 1
+                    report['bytes'] += obj['Size']
+                    if len(report['sample']) < 20:
+                        report['sample'].append(s3_key)
+                    if dry_run:
+                        continue
+                    batch.append(s3_key)
+                    if len(batch) == 1000:
+                        futures.append(executor.submit(self._delete_batch, bucket_name, batch))
+                        batch = []
+            if batch:
+                futures.append(executor.submit(self._delete_batch, bucket_name, batch))
+            for future in futures:
+                report['deleted'] += len(future.result())
+
+        action = 'Would delete' if dry_run else 'Deleted'
+        count = report['candidates'] if dry_run else report['deleted']
+        print(f"GC: scanned {report['scanned']} objects, {len(referenced)} referenced by the last {manifests} deploys. "
+              f"{action} {count} stale objects ({report['bytes'] / 1048576:.2f} MB).")
+        for s3_key in report['sample']:
+            print(f'  {s3_key}')
+        return report
+
+    def bucket_state(self, bucket_name):
+        try:
+            self.s3_client.head_bucket(Bucket=bucket_name)
+            return 'owned'
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in ('404', 'NoSuchBucket'):
+                return 'missing'
+            if code in ('403', 'AccessDenied'):
+                return 'foreign'
+            raise
+
+    def get_bucket_policy(self, bucket_name):
+        try:
+            return json.loads(self.s3_client.get_bucket_policy(Bucket=bucket_name)['Policy'])
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchBucketPolicy', 'NoSuchBucket'):
+                return None
+            raise
+
+    def bucket_policy_document(self, bucket_name, cloudfront_distribution_id, account_id):
+        return {
             "Version": "2008-10-17",
             "Id": "PolicyForCloudFrontPrivateContent",
             "Statement": [
@@ -88,6 +512,13 @@ class S3Operations:
             ]
         }
 
+    def update_bucket_policy(self, bucket_name, cloudfront_distribution_id, account_id):
+        new_policy = self.bucket_policy_document(bucket_name, cloudfront_distribution_id, account_id)
         updated_policy_json = json.dumps(new_policy)
         self.s3_client.put_bucket_policy(Bucket=bucket_name, Policy=updated_policy_json)
         print(f'Updated bucket policy for {bucket_name}')
+
+
+def stat_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from services.s3.scanner import fingerprint_tree
+
+
+class ReleaseManager:
+    def __init__(self, s3_ops, bucket_name, prefix='releases'):
+        self.s3_ops = s3_ops
+        self.s3_client = s3_ops.s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip('/')
+
+    def release_prefix(self, release_id):
+        return f'{self.prefix}/{release_id}/'
+
+    def origin_path(self, release_id):
+        return f'/{self.prefix}/{release_id}'
+
+    def release_id_from_origin_path(self, origin_path):
+        head = f'/{self.prefix}/'
+        return origin_path[len(head):] if origin_path and origin_path.startswith(head) else None
+
+    def manifest_key(self, release_id):
+        return f'{self.prefix}/{release_id}.json'
+
+    def get_manifest(self, release_id):
+        if not release_id:
+            return None
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.manifest_key(release_id))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def list_releases(self):
+        releases = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f'{self.prefix}/', Delimiter='/'):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith('.json'):
+                    releases.append((obj['LastModified'], obj['Key'][len(self.prefix) + 1:-len('.json')]))
+        return [release_id for _, release_id in sorted(releases)]
+
+    def copy_objects(self, pairs, max_workers=None):
+        def copy(source_key, s3_key):
+            self.s3_client.copy({'Bucket': self.bucket_name, 'Key': source_key}, self.bucket_name, s3_key,
+                                Config=self.s3_ops.transfer_config)
+            return s3_key
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.s3_ops.max_workers) as executor:
+            return list(executor.map(lambda pair: copy(*pair), pairs))
+
+    def publish(self, folder_path, base_release=None, digest_cache_path=None, max_workers=None):
+        local_files = fingerprint_tree(folder_path, digest_cache_path)
+        digests = {s3_key: digest for s3_key, (_, digest) in local_files.items()}
+        release_id = hashlib.sha256(json.dumps(sorted(digests.items())).encode()).hexdigest()[:16]
+        prefix = self.release_prefix(release_id)
+        keys = [prefix + s3_key for s3_key in sorted(digests)] + [self.manifest_key(release_id)]
+
+        summary = {'release': release_id, 'keys': keys, 'files': 0, 'bytes': 0, 'errors': {}, 'uploaded': [], 'copied': []}
+        if self.get_manifest(release_id):
+            print(f'Release {release_id} is already published.')
+            return summary
+
+        base = (self.get_manifest(base_release) or {}).get('files', {})
+        copies = [(self.release_prefix(base_release) + s3_key, prefix + s3_key) for s3_key, digest in digests.items() if base.get(s3_key) == digest]
+        pending = [(entry.path, prefix + s3_key) for s3_key, (entry, digest) in local_files.items() if base.get(s3_key) != digest]
+        if copies:
+            print(f'Copying {len(copies)} unchanged files from release {base_release}.')
+            summary['copied'] = self.copy_objects(copies, max_workers)
+        if pending:
+            summary.update(self.s3_ops.upload_objects(self.bucket_name, pending, max_workers,
+                                                      {prefix + s3_key: digests[s3_key] for s3_key in digests}))
+        summary['keys'] = keys
+        if summary['errors']:
+            return summary
+
+        manifest = {'release': release_id, 'created': time.time(), 'base': base_release, 'files': digests}
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=self.manifest_key(release_id), Body=json.dumps(manifest).encode(),
+                                  ContentType='application/json', CacheControl='no-store')
+        print(f'Published release {release_id} ({len(copies)} copied, {len(pending)} uploaded).')
+        return summary
+
+    def changed_keys(self, from_release, to_release):
+        before = (self.get_manifest(from_release) or {}).get('files')
+        after = (self.get_manifest(to_release) or {}).get('files', {})
+        if before is None:
+            return ['/*']
+        return sorted(s3_key for s3_key in set(before) | set(after) if before.get(s3_key) != after.get(s3_key))
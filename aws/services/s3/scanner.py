@@ -0,0 +1,104 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+ScanEntry = namedtuple('ScanEntry', ['path', 'key', 'size', 'mtime_ns'])
+
+CHUNK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+
+def scan_tree(root):
+    stack = [(root, '')]
+    while stack:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # like os.walk, do not descend into directory symlinks; a link cycle would never terminate
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, f'{prefix}{entry.name}/'))
+                elif entry.is_file(follow_symlinks=True):
+                    stat = entry.stat()
+                    yield ScanEntry(entry.path, f'{prefix}{entry.name}', stat.st_size, stat.st_mtime_ns)
+
+
+def hash_file(path, size=None, algorithm='md5'):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size if size is None else size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), CHUNK_SIZE):
+                        digest.update(view[offset:offset + CHUNK_SIZE])
+                finally:
+                    view.release()
+        else:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_fingerprint(root):
+    digest = hashlib.sha1()
+    for entry in sorted(scan_tree(root), key=lambda entry: entry.key):
+        digest.update(f'{entry.key}\0{entry.size}\0{entry.mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class DigestCache:
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, entry):
+        cached = self.entries.get(os.path.abspath(entry.path))
+        if cached and cached[0] == entry.size and cached[1] == entry.mtime_ns:
+            return cached[2]
+        return None
+
+    def put(self, entry, digest):
+        self.entries[os.path.abspath(entry.path)] = [entry.size, entry.mtime_ns, digest]
+        self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def fingerprint_tree(root, cache_path=None, max_workers=8):
+    cache = DigestCache(cache_path)
+    fingerprints = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        for entry in scan_tree(root):
+            digest = cache.get(entry)
+            if digest is not None:
+                fingerprints[entry.key] = (entry, digest)
+            else:
+                pending[entry.key] = (entry, executor.submit(hash_file, entry.path, entry.size))
+        for key, (entry, future) in pending.items():
+            digest = future.result()
+            cache.put(entry, digest)
+            fingerprints[key] = (entry, digest)
+    cache.save()
+    return fingerprints
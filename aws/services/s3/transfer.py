@@ -0,0 +1,44 @@
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+
+
+class MemoryBudget:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        size = min(size, self.max_bytes)
+        with self.condition:
+            while self.in_use + size > self.max_bytes:
+                self.condition.wait()
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+        return size
+
+    def release(self, size):
+        with self.condition:
+            self.in_use -= size
+            self.condition.notify_all()
+
+    @contextmanager
+    def reserve(self, size):
+        reserved = self.acquire(size)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+
+@contextmanager
+def open_stream(file_path):
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield file
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'lambda_gpu', 'inventory.json')
+DEFAULT_TTL = 300
+
+
+class ResourceInventory:
+    def __init__(self, session, tagFilters=None, resourceTypeFilters=None, cachePath=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        self.session = session
+        self.tagFilters = tagFilters or []
+        self.resourceTypeFilters = resourceTypeFilters or []
+        self.cachePath = cachePath
+        self.ttl = ttl
+        self.index = None
+        self.fetched = False
+        self.account = None
+
+    def accountId(self):
+        if self.account is None:
+            self.account = self.session.client('sts').get_caller_identity()['Account']
+        return self.account
+
+    def cacheKey(self):
+        return json.dumps({
+            'Account': self.accountId(),
+            'Region': self.session.region_name,
+            'TagFilters': self.tagFilters,
+            'ResourceTypeFilters': self.resourceTypeFilters
+        }, sort_keys=True)
+
+    def load(self, refresh=False):
+        if self.index is not None and not refresh:
+            return self.index
+        if not refresh and self.readCache():
+            return self.index
+        self.fetch()
+        self.fetched = True
+        self.writeCache()
+        return self.index
+
+    def fetch(self):
+        client = self.session.client('resourcegroupstaggingapi')
+        paginator = client.get_paginator('get_resources')
+        params = {}
+        if self.tagFilters:
+            params['TagFilters'] = self.tagFilters
+        if self.resourceTypeFilters:
+            params['ResourceTypeFilters'] = self.resourceTypeFilters
+
+        index = {}
+        for page in paginator.paginate(**params):
+            for resource in page['ResourceTagMappingList']:
+                for tag in resource.get('Tags', []):
+                    index.setdefault((tag['Key'], tag['Value']), set()).add(resource['ResourceARN'])
+        self.index = index
+        return index
+
+    def readCache(self):
+        if not self.cachePath:
+            return False
+        entry = self.readEntries().get(self.cacheKey())
+        if entry is None or time.time() - entry['createdAt'] > self.ttl:
+            return False
+        self.index = {(key, value): set(arns) for key, value, arns in entry['index']}
+        return True
+
+    def readEntries(self):
+        if not os.path.exists(self.cachePath):
+            return {}
+        try:
+            with open(self.cachePath, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def writeCache(self):
+        if not self.cachePath:
+            return
+        entries = self.readEntries()
+        entries[self.cacheKey()] = {
+            'createdAt': time.time(),
+            'index': [[key, value, sorted(arns)] for (key, value), arns in self.index.items()]
+        }
+        self.writeEntries(entries)
+
+    def writeEntries(self, entries):
+        directory = os.path.dirname(os.path.abspath(self.cachePath))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(entries, file)
+        os.replace(tmpPath, self.cachePath)
+
+    def invalidate(self):
+        self.index = None
+        if self.cachePath and os.path.exists(self.cachePath):
+            entries = self.readEntries()
+            if entries.pop(self.cacheKey(), None) is not None:
+                self.writeEntries(entries)
+
+    def getArns(self, tag):
+        self.fetched = False
+        arns = self.load().get((tag['Key'], tag['Value']), set())
+        # only trust cached positives; a resource created since the index was loaded must not read as missing
+        if not arns and not self.fetched:
+            arns = self.load(refresh=True).get((tag['Key'], tag['Value']), set())
+        return arns
+
+    def contains(self, tag):
+        return bool(self.getArns(tag))